@@ -0,0 +1,83 @@
+"""
+Generates dungeons for a range of seeds across a process pool and writes them to disk with save_dungeon
+
+Every dungeon gets its own random.Random(seed), so the output for a seed does not depend on the number of workers.
+
+usage: python batch_generate.py 0 1000 --workers 8 --output levels --set map_width=200 --set map_height=200
+"""
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from random import Random
+from typing import Dict, List
+
+from const import MAP_SETTINGS
+from map_objects import Dungeon, save_dungeon
+
+
+def generate(seed: int, map_settings: dict) -> Dungeon:
+    dungeon = Dungeon(map_settings, rng=Random(seed))
+    dungeon.build_dungeon()
+    return dungeon
+
+
+def generate_to_file(seed: int, map_settings: dict, output: str) -> str:
+    dungeon = generate(seed, map_settings)
+    path = os.path.join(output, f"dungeon_{seed}")
+    save_dungeon(dungeon, path)
+    return path
+
+
+def parse_settings(overrides: List[str]) -> Dict:
+    """
+    applies KEY=VALUE overrides to MAP_SETTINGS, values are read as JSON when possible
+    """
+    map_settings = dict(MAP_SETTINGS)
+    for override in overrides:
+        key, _, value = override.partition("=")
+        if key not in map_settings:
+            raise ValueError(f"unknown map setting: {key}")
+        try:
+            map_settings[key] = json.loads(value)
+        except json.JSONDecodeError:
+            map_settings[key] = value
+    return map_settings
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description="Generate dungeons for a range of seeds.")
+    parser.add_argument("start", type=int, help="first seed")
+    parser.add_argument("stop", type=int, help="seed to stop at, not generated")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="number of worker processes")
+    parser.add_argument("--output", default="levels", help="directory to write the dungeons to")
+    parser.add_argument(
+        "--set", dest="overrides", action="append", default=[], metavar="KEY=VALUE", help="override a map setting"
+    )
+    args = parser.parse_args(argv)
+
+    map_settings = parse_settings(args.overrides)
+    seeds = range(args.start, args.stop)
+
+    os.makedirs(args.output, exist_ok=True)
+    with open(os.path.join(args.output, "settings.json"), "w") as f:
+        json.dump(map_settings, f, indent=4)
+
+    start_time = time.perf_counter()
+    count = 0
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        chunksize = max(1, len(seeds) // (args.workers * 4))
+        for _ in pool.map(generate_to_file, seeds, repeat(map_settings), repeat(args.output), chunksize=chunksize):
+            count += 1
+    elapsed = time.perf_counter() - start_time
+
+    print(
+        f"generated {count} dungeons in {elapsed:.2f}s "
+        f"({count / elapsed:.2f} dungeons/s, {args.workers} workers)"
+    )
+
+
+if __name__ == "__main__":
+    main()
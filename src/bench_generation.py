@@ -0,0 +1,185 @@
+"""
+Times each phase of Dungeon.build_dungeon over a matrix of map sizes with fixed seeds
+
+Results are written as JSON. Given a baseline written by an earlier run on the same machine, phases that got
+slower than the tolerance allows are reported and the exit code is 1. Cases missing from the baseline aren't
+compared. Times are absolute seconds, so a baseline only means something on the machine that recorded it:
+bench_generation_baseline.json holds the --quick cases from one machine as a reference, regenerate it before
+comparing against it elsewhere.
+
+usage:
+    python bench_generation.py --quick
+    python bench_generation.py --case 51x31:100 --case 200x200:400 --seed 0 --baseline results.json
+    python bench_generation.py --quick --output bench_generation_baseline.json     refreshes the baseline
+"""
+import argparse
+import io
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+from random import Random
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from const import MAP_SETTINGS
+from map_objects import Dungeon
+
+DEFAULT_CASES = ["51x31:100", "100x100:200", "250x250:500", "500x500:1000", "1000x1000:2000"]
+QUICK_CASES = ["51x31:100", "100x100:200"]
+DEFAULT_SEEDS = [0, 1, 2]
+
+PHASES = ["initialize_map", "place_random_rooms", "grow_maze", "connect_regions", "remove_dead_ends"]
+
+
+def parse_case(case: str) -> Tuple[int, int, int]:
+    """
+    :param case: WIDTHxHEIGHT:NUM_ROOMS
+    :return: map_width, map_height, num_rooms
+    """
+    size, _, num_rooms = case.partition(":")
+    width, _, height = size.partition("x")
+    return int(width), int(height), int(num_rooms or MAP_SETTINGS["num_rooms"])
+
+
+def run_phases(dungeon: Dungeon) -> Dict[str, float]:
+    """
+    runs the phases of build_dungeon one at a time
+    :return: seconds spent in each phase
+    """
+    steps = [
+        dungeon.initialize_map,
+        lambda: dungeon.place_random_rooms(
+            min_room_size=dungeon.map_settings["min_room_size"],
+            max_room_size=dungeon.map_settings["max_room_size"],
+        ),
+        dungeon.grow_mazes,
+        dungeon.connect_regions,
+        dungeon.remove_dead_ends,
+    ]
+    timings = {}
+    for phase, step in zip(PHASES, steps):
+        start = time.perf_counter()
+        step()
+        timings[phase] = time.perf_counter() - start
+    return timings
+
+
+def run_case(width: int, height: int, num_rooms: int, seed: int, measure_memory: bool, repeat: int = 1) -> Dict:
+    """
+    :param repeat: number of builds to time, each phase keeps its fastest time so one noisy run doesn't count
+    """
+    map_settings = dict(MAP_SETTINGS, map_width=width, map_height=height, num_rooms=num_rooms)
+
+    # the generator prints progress notes that would drown out the results
+    with redirect_stdout(io.StringIO()):
+        timings = run_phases(Dungeon(map_settings, rng=Random(seed)))
+        for _ in range(repeat - 1):
+            again = run_phases(Dungeon(map_settings, rng=Random(seed)))
+            timings = {phase: min(seconds, again[phase]) for phase, seconds in timings.items()}
+
+        peak_bytes = None
+        if measure_memory:
+            # tracemalloc slows allocation down, so memory gets its own run
+            tracemalloc.start()
+            run_phases(Dungeon(map_settings, rng=Random(seed)))
+            _, peak_bytes = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+    return dict(
+        map_width=width,
+        map_height=height,
+        num_rooms=num_rooms,
+        seed=seed,
+        phases=timings,
+        total=sum(timings.values()),
+        peak_bytes=peak_bytes,
+    )
+
+
+def case_key(result: Dict) -> Tuple[int, int, int, int]:
+    return result["map_width"], result["map_height"], result["num_rooms"], result["seed"]
+
+
+def compare(results: List[Dict], baseline: List[Dict], tolerance: float, min_seconds: float) -> List[str]:
+    """
+    :return: a line for every phase slower than baseline * (1 + tolerance) by more than min_seconds
+    """
+    previous = {case_key(result): result for result in baseline}
+    regressions = []
+    for result in results:
+        old = previous.get(case_key(result))
+        if old is None:
+            continue
+        for phase in PHASES + ["total"]:
+            new_time = result["total"] if phase == "total" else result["phases"][phase]
+            old_time = old["total"] if phase == "total" else old["phases"][phase]
+            if new_time > old_time * (1 + tolerance) and new_time - old_time > min_seconds:
+                # a coarse timer can record a trivial phase as taking no time at all
+                change = f"{new_time / old_time - 1:+.0%}" if old_time > 0 else "was 0s"
+                regressions.append(
+                    "{}x{}:{} seed {} {}: {:.4f}s -> {:.4f}s ({})".format(
+                        *case_key(result), phase, old_time, new_time, change
+                    )
+                )
+    return regressions
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the dungeon generation pipeline.")
+    parser.add_argument("--case", dest="cases", action="append", metavar="WxH:ROOMS", help="map size to run")
+    parser.add_argument("--quick", action="store_true", help=f"only run {', '.join(QUICK_CASES)}")
+    parser.add_argument("--seed", dest="seeds", action="append", type=int, help="seed to run each case with")
+    parser.add_argument("--repeat", type=int, default=3, help="builds per case and seed, the fastest counts")
+    parser.add_argument("--no-memory", dest="memory", action="store_false", help="skip the peak memory runs")
+    parser.add_argument("--output", help="file to write the JSON results to, defaults to stdout")
+    parser.add_argument("--baseline", help="JSON results of an earlier run on this machine to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown as a fraction")
+    parser.add_argument("--min-seconds", type=float, default=0.005, help="ignore slowdowns smaller than this")
+    args = parser.parse_args(argv)
+
+    cases = args.cases or (QUICK_CASES if args.quick else DEFAULT_CASES)
+    seeds = args.seeds or DEFAULT_SEEDS
+
+    results = []
+    for case in cases:
+        width, height, num_rooms = parse_case(case)
+        for seed in seeds:
+            result = run_case(width, height, num_rooms, seed, args.memory, args.repeat)
+            results.append(result)
+            print(
+                f"{width}x{height}:{num_rooms} seed {seed}: {result['total']:.3f}s "
+                + " ".join(f"{phase}={seconds:.3f}" for phase, seconds in result["phases"].items()),
+                file=sys.stderr,
+            )
+
+    report = dict(
+        python=platform.python_version(),
+        numpy=np.__version__,
+        machine=platform.machine(),
+        results=results,
+    )
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=4)
+            f.write("\n")
+    else:
+        json.dump(report, sys.stdout, indent=4)
+        sys.stdout.write("\n")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.tolerance, args.min_seconds)
+        for line in regressions:
+            print(f"regression: {line}", file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,73 @@
+"""
+Runs engine.main on the headless terminal backend with a scripted random walk and reports frame time and
+turn throughput, so the game loop can be measured without a display
+
+usage:
+    python bench_loop.py --turns 2000 --seed 0
+"""
+import argparse
+import io
+import json
+import statistics
+import sys
+from contextlib import redirect_stdout
+from random import Random
+
+import engine
+from terminal_backend import HeadlessBackend, Keys, use_backend
+
+MOVE_KEYS = [Keys.TK_H, Keys.TK_J, Keys.TK_K, Keys.TK_L, Keys.TK_Y, Keys.TK_U, Keys.TK_B, Keys.TK_N]
+
+
+def run(turns: int, seed: int, timings_path: str = None) -> dict:
+    """
+    :return: frame and turn timings of one headless run of turns scripted moves
+    """
+    rng = Random(seed)
+    backend = HeadlessBackend(keys=[rng.choice(MOVE_KEYS) for _ in range(turns)])
+    use_backend(backend)
+
+    backend.open()
+    with redirect_stdout(io.StringIO()):
+        engine.main(random_seed=seed, timings_path=timings_path)
+    backend.close()
+
+    # the first refresh happens before the loop, after the dungeon is built
+    frame_times = [b - a for a, b in zip(backend.frame_times, backend.frame_times[1:])]
+    elapsed = backend.frame_times[-1] - backend.frame_times[0]
+    frames = len(frame_times)
+    return dict(
+        turns=turns,
+        seed=seed,
+        frames=frames,
+        seconds=elapsed,
+        turns_per_second=turns / elapsed if elapsed else 0.0,
+        mean_frame_ms=1000 * elapsed / frames if frames else 0.0,
+        median_frame_ms=1000 * statistics.median(frame_times) if frames else 0.0,
+        max_frame_ms=1000 * max(frame_times) if frames else 0.0,
+        puts_per_frame=backend.calls["put"] / frames if frames else 0.0,
+    )
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=1000, help="number of scripted moves")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the dungeon and the walk")
+    parser.add_argument("--output", help="also write the results to this JSON file")
+    parser.add_argument("--timings", metavar="CSV", help="write the per-phase frame timings to this file")
+    args = parser.parse_args(argv)
+
+    results = run(args.turns, args.seed, args.timings)
+    print(
+        f"{results['turns']} turns in {results['seconds']:.3f}s: {results['turns_per_second']:.0f} turns/s, "
+        f"frame mean {results['mean_frame_ms']:.3f}ms median {results['median_frame_ms']:.3f}ms "
+        f"max {results['max_frame_ms']:.3f}ms, {results['puts_per_frame']:.1f} puts/frame"
+    )
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
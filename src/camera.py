@@ -1,4 +1,6 @@
 #from entity import Entity
+from typing import Optional, Tuple
+
 from map_objects import Point
 from rect import Rect
 from const import CAMERA_HEIGHT, CAMERA_WIDTH
@@ -57,10 +59,41 @@ class Camera:
     def offset(self) -> Point:
         return Point(self.x_offset, self.y_offset)
 
-    @property
-    def view(self) -> dict:
-        view = {}
-        for x, y, point in iter(self):
-            view[point] = Point(x, y)
+    def in_view(self, point: Point) -> bool:
+        return 0 <= point.x - self.x < self.width and 0 <= point.y - self.y < self.height
+
+    def world_to_screen(self, point: Point) -> Optional[Point]:
+        """
+        :param point: position on the map
+        :type point: Point
+        :return: position in the camera's view, or None if the point is outside of it
+        :rtype: Point
+        """
+        x, y = point.x - self.x, point.y - self.y
+        if 0 <= x < self.width and 0 <= y < self.height:
+            return Point(x, y)
+        return None
+
+    def screen_to_world(self, x: int, y: int) -> Optional[Point]:
+        """
+        :return: position on the map shown at x, y of the camera's view, or None if x, y is outside the view
+        :rtype: Point
+        """
+        if 0 <= x < self.width and 0 <= y < self.height:
+            return Point(self.x + x, self.y + y)
+        return None
+
+    def map_window(self, map_width: int, map_height: int) -> Tuple[Tuple[slice, slice], Tuple[slice, slice]]:
+        """
+        the part of the map the camera sees, clipped to the map's bounds
+        :return: (x, y) slices into the map grids and the (x, y) slices of the view they are drawn to
+        :rtype: Tuple[Tuple[slice, slice], Tuple[slice, slice]]
+        """
+        x0, y0 = max(self.x, 0), max(self.y, 0)
+        x1, y1 = min(self.x + self.width, map_width), min(self.y + self.height, map_height)
+        # an empty window keeps both slices empty
+        x1, y1 = max(x1, x0), max(y1, y0)
 
-        return view
+        world = (slice(x0, x1), slice(y0, y1))
+        screen = (slice(x0 - self.x, x1 - self.x), slice(y0 - self.y, y1 - self.y))
+        return world, screen
@@ -1,8 +1,10 @@
-from bearlibterminal import terminal
-
+import os
 
 TITLE = "Drag Dungeons"
 
+# enables consistency checks that are too slow to run every time, e.g. in initialize_fov
+DEBUG = bool(os.environ.get("DRAG_DUNGEONS_DEBUG"))
+
 SCREEN_WIDTH = 80
 SCREEN_HEIGHT = 50
 
@@ -12,9 +14,29 @@ CAMERA_HEIGHT = 21
 FOV_ALGORITHM = 0
 FOV_LIGHT_WALLS = True
 FOV_RADIUS = 10
+FOV_CACHE_MAX_BYTES = 1024 * 1024
+# cells a map needs before caching fov beats recomputing it, below it tcod clears and computes faster than a lookup
+FOV_CACHE_MIN_AREA = 100 * 100
+
+# half the size of the box around the player monsters follow the flow field in
+FLOW_FIELD_RADIUS = 2 * FOV_RADIUS
+# monsters wake up when the player comes within WAKE_RADIUS and fall asleep past SLEEP_RADIUS
+WAKE_RADIUS = FLOW_FIELD_RADIUS
+SLEEP_RADIUS = 2 * WAKE_RADIUS
+# seconds the enemy turn may spend searching for new paths, monsters without a cached path wait once it's spent
+ENEMY_TURN_BUDGET = 0.005
 
 FONT_PATH = "data/consolas10x10.png"
 
+CACHE_DIRECTORY = "cache/dungeons"
+CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+TILES_DIRECTORY = "tiles"
+TILE_MANIFEST_PATH = "cache/tile_manifest.json"
+# config.ini loads the sprites in Tiles at 0xE000 - 0xE009
+TILE_FIRST_CODEPOINT = 0xE100
+TILE_SIZE = "32x32"
+
 MAP_SETTINGS = {
     "map_height": 31,
     "map_width": 51,
@@ -23,6 +45,7 @@ MAP_SETTINGS = {
     "min_room_size": 3,
     "max_room_size": 7,
     "room_margin": 1,
+    "room_sampling": "random",
     "extra_door_chance": 30,
     "max_monsters_per_room": 3
 }
@@ -1,75 +1,162 @@
+import argparse
 import random
 from datetime import datetime
-from bearlibterminal import terminal
+from typing import Optional
+from terminal_backend import terminal
 # from loguru import logger
 
-from const import Tiles, MAP_SETTINGS
+from const import (
+    TITLE, SCREEN_WIDTH, Tiles, MAP_SETTINGS, CACHE_DIRECTORY, CACHE_MAX_BYTES, FOV_CACHE_MAX_BYTES, FOV_CACHE_MIN_AREA,
+    FOV_RADIUS, ENEMY_TURN_BUDGET, FLOW_FIELD_RADIUS, WAKE_RADIUS, SLEEP_RADIUS,
+)
 from camera import Camera
 
-from entity import Entity, blocking_entities
+from entity import Entity
 from fov_functions import initialize_fov, update_fov
 from handle_keys import handle_keys
-from render_functions import render_all, clear_all
-from map_objects import Dungeon, Point
-from game_states import GameStates
+from frame_timer import FrameTimer
+from render_functions import render_all, clear_all, MapRenderer, draw_frame_stats, clear_frame_stats
+from map_objects import Dungeon, DungeonCache, FlowField, FovCache, Point
+from pathfinding import Pathfinder
+from scheduler import TurnScheduler
 
 
 class Game:
     def __init__(self, random_seed=None):
+        self.cache = None
         if random_seed is None:
-            self.random_seed = datetime.now()
+            self.random_seed = clock_seed()
         else:
             self.random_seed = random_seed
+            self.cache = DungeonCache(CACHE_DIRECTORY, CACHE_MAX_BYTES)
 
-        self.dungeon = Dungeon(MAP_SETTINGS)
+        self.dungeon = None
+        self.entities = None
 
     def on_enter(self):
-        random.seed(self.random_seed)
-        self.dungeon.build_dungeon()
+        self.dungeon, self.entities = load_or_build_dungeon(self.random_seed, self.cache)
 
 
-def main():
-    game_exit = False
-    random_seed = datetime.now()
-    print(random_seed)
+def clock_seed() -> int:
+    """
+    :return: a seed from the current time, in microseconds since the epoch, random.seed doesn't take a datetime
+    :rtype: int
+    """
+    return int(datetime.now().timestamp() * 1e6)
+
+
+def load_or_build_dungeon(random_seed, cache: Optional[DungeonCache]):
+    """
+    loads the dungeon for random_seed from the cache, or builds it, places the entities and caches it
+    :param cache: None to always build the dungeon and not cache it
+    :return: the dungeon and its entities, the player first
+    """
+    if cache is not None:
+        dungeon = cache.load(random_seed, MAP_SETTINGS)
+        if dungeon is not None:
+            return dungeon, dungeon.entities
+
     random.seed(random_seed)
     dungeon = Dungeon(MAP_SETTINGS)
     dungeon.build_dungeon()
 
-    game_map = dungeon.game_map
-
-    fov_update: bool = True
-    initialize_fov(game_map=game_map)
-
     player = Entity("Player", dungeon.starting_position, char=Tiles.PLAYER, color="white", blocks=True)
     # npc = Entity("NPC", Point(player.x + 1, player.y + 1), char="@", color="yellow")
     entities = dungeon.place_entities(player)
 
-    camera = Camera(player)
+    if cache is not None:
+        cache.store(random_seed, MAP_SETTINGS, dungeon)
+    return dungeon, entities
+
+
+def enemy_turn(monsters, player: Entity, game_map, entity_index, pathfinder: Pathfinder):
+    """
+    moves each monster that sees the player a step toward it, down the flow field or along a cached path
+    """
+    observers = [monster.position for monster in monsters]
+    sees_player = game_map.lines_of_sight(observers, [player.position], FOV_RADIUS)[:, 0]
+    for monster, sees in zip(monsters, sees_player):
+        if not sees:
+            continue
+        step = game_map.flow_field.step(monster.position, entity_index.is_blocked)
+        on_path = step is None
+        if on_path:
+            # outside the field, or every way closer is taken
+            step = pathfinder.peek_step(monster.position, player.position)
+        if step is None:
+            continue
+        if step == player.position:
+            print(f"The {monster} shoves you, much to your annoyance!")
+        elif not entity_index.is_blocked(step):
+            if on_path:
+                pathfinder.take_step(monster.position, player.position)
+            monster.move(step - monster.position)
+
+
+def main(random_seed=None, timings_path: str = None, cache_directory: str = CACHE_DIRECTORY):
+    """
+    :param random_seed: seed for the dungeon, the current time if not given, only dungeons of given seeds are cached
+    :param timings_path: if given, the per-phase frame timings are written to this CSV file on exit
+    :param cache_directory: where dungeons are cached by seed
+    """
+    game_exit = False
+    cache = None
+    if random_seed is None:
+        # a seed from the clock never comes up again, caching its dungeon would only cost a store and an evict
+        random_seed = clock_seed()
+    else:
+        cache = DungeonCache(cache_directory, CACHE_MAX_BYTES)
+    print(random_seed)
+    dungeon, entities = load_or_build_dungeon(random_seed, cache)
+    player = entities[0]
 
-    terminal.refresh()
+    game_map = dungeon.game_map
+    if game_map.width * game_map.height >= FOV_CACHE_MIN_AREA:
+        game_map.fov_cache = FovCache(FOV_CACHE_MAX_BYTES)
+    entity_index = dungeon.entity_index
+    game_map.flow_field = FlowField(game_map, FLOW_FIELD_RADIUS)
+    pathfinder = Pathfinder(game_map, entity_index)
 
-    game_state = GameStates.PLAYER_TURN
-    
-    while not game_exit:
-        key = None
-        if terminal.has_input():
-            key = terminal.read()
+    fov_update: bool = False
+    initialize_fov(game_map=game_map)
 
-        if fov_update:
-            update_fov(game_map, player.position)
+    camera = Camera(player)
+    renderer = MapRenderer(camera.width, camera.height)
 
-        render_all(entities, game_map=game_map, fov_update=fov_update, camera=camera)
+    # the player acts first, monsters are only woken after each player action, the first one included, so the
+    # ones near the start are scheduled behind the player like the ones it comes across later
+    scheduler = TurnScheduler()
+    scheduler.schedule(player, delay=0)
+    scheduler.pop()
 
-        fov_update = False
+    timer = FrameTimer()
+    show_timings = False
 
-        terminal.refresh()
-        clear_all(entities)
+    update_fov(game_map, player.position)
+    render_all(entities, game_map=game_map, fov_update=True, camera=camera, renderer=renderer)
+    terminal.refresh()
+
+    while not game_exit:
+        # blocks until the next event, so an idle session doesn't use the CPU
+        key = terminal.read()
+        timer.start_frame()
 
         action = handle_keys(key)
 
         move = action.get("move")
         game_exit = action.get("exit", False)
+        if action.get("show_timings"):
+            show_timings = not show_timings
+            if not show_timings:
+                clear_frame_stats(SCREEN_WIDTH)
+        # only keys the game acts on change what is on screen
+        redraw = bool(action) and not game_exit
+        timer.lap("input")
+
+        if redraw:
+            # entities are cleared where they are now, before anything moves
+            clear_all(entities, camera)
+        timer.lap("clear_all")
 
         # if action.get("rebuild"):
         #     random_seed = datetime.now()
@@ -80,16 +167,11 @@ def main():
         #     game_map = dungeon.game_map
         #     fov_update = True
 
-        if game_state == GameStates.ENEMY_TURN:
-            for entity in entities[1:]:
-                print(f"The {entity} ponders the meaning of its existence.")
-
-            game_state = GameStates.PLAYER_TURN
-
-        if move and game_state == GameStates.PLAYER_TURN:
+        took_turn = False
+        if move:
             point = player.position + move
             if not game_map.blocked(point):
-                target = blocking_entities(entities, point)
+                target = entity_index.blocking(point)
 
                 if target:
                     print(f"You kick the {target} in the shins, much to its annoyance!")
@@ -99,10 +181,50 @@ def main():
 
                     fov_update = True
 
-                game_state = GameStates.ENEMY_TURN
+                took_turn = True
+        timer.lap("player_turn")
+
+        # everyone awake whose action comes before the player's next one acts right away
+        if took_turn:
+            scheduler.schedule(player)
+            scheduler.update_sleep(entity_index, player.position, WAKE_RADIUS, SLEEP_RADIUS)
+            pathfinder.start_turn(ENEMY_TURN_BUDGET)
+            game_map.flow_field.set_target(player.position)
+
+            due = scheduler.due_before(player)
+            while due:
+                enemy_turn([monster for _, monster in due], player, game_map, entity_index, pathfinder)
+                for time, monster in due:
+                    scheduler.schedule(monster, start=time)
+                due = scheduler.due_before(player)
+            scheduler.pop()
+        timer.lap("enemy_turn")
+
+        if fov_update:
+            update_fov(game_map, player.position)
+        timer.lap("update_fov")
+
+        if redraw:
+            render_all(entities, game_map=game_map, fov_update=fov_update, camera=camera, renderer=renderer)
+            if show_timings:
+                draw_frame_stats(timer, SCREEN_WIDTH)
+            timer.lap("render_all")
+
+            terminal.refresh()
+            timer.lap("refresh")
+
+        fov_update = False
+        timer.end_frame()
+
+    if timings_path is not None:
+        timer.dump_csv(timings_path)
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=TITLE)
+    parser.add_argument("--timings", metavar="CSV", help="write per-phase frame timings to this file on exit")
+    args = parser.parse_args()
+
     terminal.open()
     terminal.composition(True)
     # logger.add(
@@ -110,5 +232,5 @@ if __name__ == "__main__":
     #     level="ERROR",
     #     format="{time:HH:mm:ss.SSS} {message}",
     # )
-    main()
+    main(timings_path=args.timings)
     terminal.close()
@@ -1,4 +1,6 @@
-from typing import List
+from typing import Callable, Dict, Iterable, List, Optional
+
+import numpy
 
 from map_objects import Point
 
@@ -7,14 +9,21 @@ class Entity:
     """
     A generic object to represent players, enemies, items, etc.
     """
-    def __init__(self, name: str, position: Point, char: str, color: str = None, blocks: bool = False):
+    def __init__(
+        self, name: str, position: Point, char: str, color: str = None, blocks: bool = False, speed: int = 100
+    ):
         if color is None:
             color = "white"
+        if speed <= 0:
+            raise ValueError(f"{name} has speed {speed}, it has to be positive")
         self.name: str = name
         self.position: Point = position
         self.char: str = char
         self.color: str = color
         self.blocks: bool = blocks
+        # 100 acts once per turn, 200 twice as often
+        self.speed: int = speed
+        self.index: Optional["EntityIndex"] = None
 
     def __str__(self):
         return self.name
@@ -28,7 +37,10 @@ class Entity:
         return self.position.y
 
     def move(self, direction: Point):
+        old_position = self.position
         self.position += direction
+        if self.index is not None:
+            self.index.moved(self, old_position)
 
 
 def blocking_entities(entities: List[Entity], point: Point) -> Entity:
@@ -37,3 +49,113 @@ def blocking_entities(entities: List[Entity], point: Point) -> Entity:
             return entity
 
     return None
+
+
+class EntityIndex:
+    """
+    Spatial index of the entities on a map, kept in sync by Entity.move
+
+    Args:
+        width and height of the map
+        entities to add, in order
+
+    Attributes:
+        entities: every entity in the index, in the order they were added
+        occupancy: number of blocking entities on each cell, indexed [x, y] like the GameMap grids
+        positions: position -> entities there, in the order they arrived
+        occupancy_listeners: called with each point whose occupancy changed
+    """
+
+    def __init__(self, width: int, height: int, entities: Iterable[Entity] = ()):
+        self.width: int = width
+        self.height: int = height
+        self.entities: List[Entity] = []
+        self.occupancy = numpy.zeros((width, height), dtype=numpy.int16, order="F")
+        self.positions: Dict[Point, List[Entity]] = {}
+        self.occupancy_listeners: List[Callable[[Point], None]] = []
+
+        for entity in entities:
+            self.add(entity)
+
+    def __len__(self):
+        return len(self.entities)
+
+    def __iter__(self):
+        return iter(self.entities)
+
+    def add(self, entity: Entity):
+        entity.index = self
+        self.entities.append(entity)
+        self._place(entity, entity.position)
+
+    def remove(self, entity: Entity):
+        self._lift(entity, entity.position)
+        self.entities.remove(entity)
+        entity.index = None
+
+    def moved(self, entity: Entity, old_position: Point):
+        """
+        updates the index for an entity that moved from old_position to its current position
+        """
+        self._lift(entity, old_position)
+        self._place(entity, entity.position)
+
+    def _place(self, entity: Entity, point: Point):
+        self.positions.setdefault(point, []).append(entity)
+        if entity.blocks:
+            self.occupancy[point.x, point.y] += 1
+            for listener in self.occupancy_listeners:
+                listener(point)
+
+    def _lift(self, entity: Entity, point: Point):
+        here = self.positions[point]
+        here.remove(entity)
+        if not here:
+            del self.positions[point]
+        if entity.blocks:
+            self.occupancy[point.x, point.y] -= 1
+            for listener in self.occupancy_listeners:
+                listener(point)
+
+    def at(self, point: Point) -> List[Entity]:
+        """
+        :return: the entities at point, empty if there are none
+        :rtype: List[Entity]
+        """
+        return self.positions.get(point, [])
+
+    def is_blocked(self, point: Point) -> bool:
+        return self.occupancy[point.x, point.y] > 0
+
+    def blocking(self, point: Point) -> Optional[Entity]:
+        """
+        :return: the first blocking entity at point, or None, like blocking_entities
+        :rtype: Entity
+        """
+        for entity in self.positions.get(point, ()):
+            if entity.blocks:
+                return entity
+        return None
+
+    def near(self, point: Point, radius: int) -> List[Entity]:
+        """
+        :return: the entities within radius of point in both x and y, whichever of the cells in the box or the
+            occupied positions is fewer gets looked at
+        :rtype: List[Entity]
+        """
+        x0, x1 = max(point.x - radius, 0), min(point.x + radius, self.width - 1)
+        y0, y1 = max(point.y - radius, 0), min(point.y + radius, self.height - 1)
+        if (x1 - x0 + 1) * (y1 - y0 + 1) <= len(self.positions):
+            positions = self.positions
+            return [
+                entity
+                for y in range(y0, y1 + 1)
+                for x in range(x0, x1 + 1)
+                for entity in positions.get(Point(x, y), ())
+            ]
+        return [
+            entity
+            for position, here in self.positions.items()
+            if x0 <= position.x <= x1 and y0 <= position.y <= y1
+            for entity in here
+        ]
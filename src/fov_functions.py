@@ -1,16 +1,20 @@
 import const
-from map_objects import Point, Tile
+from map_objects import Point, TileType
 from map_objects.game_map import GameMap
+from map_objects.tile import TRANSPARENT_TABLE, WALKABLE_TABLE
 
 
 def initialize_fov(game_map: GameMap):
+    """
+    in debug mode, checks that the walkable and transparent grids tcod computes fov from agree with the tile kind
+    of every cell in label_grid, otherwise does nothing
+    """
+    if not const.DEBUG:
+        return
 
-    for y in range(game_map.height):
-        for x in range(game_map.width):
-            point = Point(x, y)
-            tile: Tile = game_map.tile(point)
-            assert game_map.transparent[x, y] == tile.transparent
-            assert game_map.walkable[x, y] == tile.walkable
+    labels = game_map.label_grid - TileType.EMPTY.value
+    assert (game_map.transparent == TRANSPARENT_TABLE[labels]).all()
+    assert (game_map.walkable == WALKABLE_TABLE[labels]).all()
 
 
 def update_fov(game_map: GameMap, position: Point):
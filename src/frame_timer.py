@@ -0,0 +1,84 @@
+import csv
+import time
+from typing import Dict, Tuple
+
+import numpy
+
+
+class FrameTimer:
+    """
+    Records the time spent in each phase of the game loop into a ring buffer of the last capacity frames
+
+    Call start_frame() at the top of the loop, lap(phase) after each phase and end_frame() at the bottom.
+    A lap is charged to the phase named, and a phase lapped more than once in a frame adds up.
+
+    Args:
+        capacity: number of frames kept, older frames are overwritten
+        phases: names of the phases, in the order they are written to the CSV
+
+    Attributes:
+        samples: seconds spent in each phase of each frame, one row per frame, the last column is the whole frame
+        count: number of frames recorded since creation, the ring buffer holds the last min(count, capacity)
+    """
+
+    PHASES = ("input", "clear_all", "player_turn", "enemy_turn", "update_fov", "render_all", "refresh")
+
+    def __init__(self, capacity: int = 1024, phases: Tuple[str, ...] = PHASES):
+        self.capacity: int = capacity
+        self.phases: Tuple[str, ...] = phases
+        self.columns: Dict[str, int] = {phase: i for i, phase in enumerate(phases)}
+        self.samples = numpy.zeros((capacity, len(phases) + 1), dtype=numpy.float64)
+        self.count: int = 0
+
+        self._row = None
+        self._frame_start: float = 0.0
+        self._last: float = 0.0
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def start_frame(self):
+        self._row = self.samples[self.count % self.capacity]
+        self._row[:] = 0.0
+        self._frame_start = self._last = time.perf_counter()
+
+    def lap(self, phase: str):
+        now = time.perf_counter()
+        self._row[self.columns[phase]] += now - self._last
+        self._last = now
+
+    def end_frame(self):
+        self._row[-1] = time.perf_counter() - self._frame_start
+        self.count += 1
+
+    def recorded(self) -> numpy.ndarray:
+        """
+        :return: the rows held in the ring buffer, oldest first
+        :rtype: numpy.ndarray
+        """
+        if self.count <= self.capacity:
+            return self.samples[:self.count]
+        start = self.count % self.capacity
+        return numpy.concatenate((self.samples[start:], self.samples[:start]))
+
+    def frame_stats(self) -> Dict[str, float]:
+        """
+        :return: p50, p95 and max of the whole frame time over the ring buffer, in milliseconds
+        :rtype: Dict[str, float]
+        """
+        frames = self.recorded()[:, -1]
+        if not len(frames):
+            return dict(p50=0.0, p95=0.0, max=0.0)
+        p50, p95 = numpy.percentile(frames, [50, 95]) * 1000
+        return dict(p50=float(p50), p95=float(p95), max=float(frames.max() * 1000))
+
+    def dump_csv(self, path: str):
+        """
+        writes one row per recorded frame with the seconds spent in each phase and in the whole frame
+        """
+        first = self.count - len(self)
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(("frame",) + self.phases + ("total",))
+            for i, row in enumerate(self.recorded().tolist()):
+                writer.writerow([first + i] + row)
@@ -1,6 +0,0 @@
-from enum import Enum, auto
-
-
-class GameStates(Enum):
-    PLAYER_TURN = auto()
-    ENEMY_TURN = auto()
@@ -1,4 +1,4 @@
-from bearlibterminal import terminal
+from terminal_backend import terminal
 
 from map_objects import Point
 
@@ -30,5 +30,7 @@ def handle_keys(key):
             return {"exit": True}
         elif key == terminal.TK_R:
             return {"rebuild": True}
+        elif key == terminal.TK_F1:
+            return {"show_timings": True}
 
         return {}
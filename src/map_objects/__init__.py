@@ -2,4 +2,8 @@ from map_objects.point import Point
 from map_objects.tile import Tile, TileType
 from map_objects.dungeon import Dungeon, Room
 from map_objects.enums import Direction
+from map_objects.flow_field import FlowField
+from map_objects.fov_cache import FovCache
 from map_objects.game_map import GameMap
+from map_objects.grid_backend import GridBackend
+from map_objects.serialization import DungeonCache, load_dungeon, save_dungeon
@@ -0,0 +1,55 @@
+from typing import List
+
+
+class DisjointSet:
+    """
+    Union-find over the integers 0 to size - 1, with union by rank and path halving
+
+    Args:
+        number of elements in the set
+
+    Attributes:
+        parent: parent of each element, roots are their own parent
+        rank: upper bound on the height of the tree under each root
+    """
+
+    def __init__(self, size: int):
+        self.parent: List[int] = list(range(size))
+        self.rank: List[int] = [0] * size
+
+    def __len__(self):
+        return len(self.parent)
+
+    def find(self, i: int) -> int:
+        """
+        :param i: element to look up
+        :type i: int
+        :return: root of the set containing i
+        :rtype: int
+        """
+        parent = self.parent
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    def union(self, i: int, j: int) -> bool:
+        """
+        merges the sets containing i and j
+        :return: False if i and j were already in the same set
+        :rtype: bool
+        """
+        i_root = self.find(i)
+        j_root = self.find(j)
+        if i_root == j_root:
+            return False
+
+        if self.rank[i_root] < self.rank[j_root]:
+            i_root, j_root = j_root, i_root
+        self.parent[j_root] = i_root
+        if self.rank[i_root] == self.rank[j_root]:
+            self.rank[i_root] += 1
+        return True
+
+    def connected(self, i: int, j: int) -> bool:
+        return self.find(i) == self.find(j)
@@ -1,59 +1,71 @@
+import heapq
+import random
 import numpy as np
 
-from collections import defaultdict, OrderedDict
-from loguru import logger
-from random import randint, randrange, choice
-from typing import Dict, Iterable, List, Set, Tuple
+from collections import defaultdict, deque, OrderedDict
+from itertools import combinations
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
 
 from const import Tiles
-from entity import Entity
+from entity import Entity, EntityIndex
 from map_objects.game_map import GameMap
+from map_objects.disjoint_set import DisjointSet
 from map_objects.enums import Direction
+from map_objects.free_space import FreeSpaceTable
+from map_objects.grid_backend import GridBackend
+from map_objects.lazy_logging import catch
 from map_objects.point import Point
-from map_objects.tile import Tile, TileType
+from map_objects.tile import Tile, TileType, TILE_KINDS
 from map_objects.kruskal import Graph
 from rect import Rect
 
 
 class RegionGraph:
+    """
+    Adjacency lists of the connectors between regions, plus a DisjointSet of the regions joined so far
+
+    Args:
+        number of regions (vertices) and the region every other region gets joined to
+
+    Attributes:
+        edges: (region, region, connection point) for every connector
+        adjacency: indices into edges for the connectors touching each region
+        regions: DisjointSet of the regions, the set containing main_region is the merged region
+    """
+
     def __init__(self, vertices: int, main_region: int):
         self.V = vertices
 
-        self.adj_matrix = np.zeros((vertices, vertices), dtype=np.int)
-        self.connected_matrix = np.zeros_like(self.adj_matrix)
-        for i in range(vertices):
-            self.adj_matrix[i, i] = 1
-            self.connected_matrix[i, i] = 1
+        self.edges: List[Tuple[int, int, Point]] = []
+        self.adjacency: Dict[int, List[int]] = defaultdict(list)
+        self.regions = DisjointSet(vertices)
 
         self.edge_points: Dict[Tuple[int, int], List[Point]] = defaultdict(list)
         self._main_region = main_region
         self.connection_points: Set[Point] = set()
 
     def add_edge(self, v1: int, v2: int, connection: Point = None):
-        self.adj_matrix[v1, v2] = 1
-        self.adj_matrix[v2, v1] = 1
+        self.adjacency[v1].append(len(self.edges))
+        self.adjacency[v2].append(len(self.edges))
+        self.edges.append((v1, v2, connection))
         self.edge_points[(min(v1, v2), max(v1, v2))].append(connection)
 
-    def remove_edge(self, v1: int, v2: int):
-        self.adj_matrix[v1, v2] = 0
-        self.adj_matrix[v2, v1] = 0
-        # del self.edge_points[(min(v1, v2), max(v1, v2))]
-
     def join_regions(self, v1: int, point: Point):
-        for v2 in self.merged_regions:
-            self.connected_matrix[v1, v2] = 1
-            self.connected_matrix[v2, v1] = 1
-            self.remove_edge(v1, v2)
+        self.regions.union(self._main_region, v1)
         self.connection_points.add(point)
 
-    def find_neighbors(self, v1: int):
-        for v2 in range(self.V):
-            if self.adj_matrix[v1, v2] == 1:
-                yield v2
+    def is_merged(self, v1: int) -> bool:
+        return self.regions.connected(self._main_region, v1)
+
+    def find_neighbors(self, v1: int) -> Iterable[int]:
+        for edge in self.adjacency[v1]:
+            r1, r2, _ = self.edges[edge]
+            yield r2 if r1 == v1 else r1
 
     def find_connections(self, v1: int) -> Iterable[int]:
+        root = self.regions.find(v1)
         for v2 in range(self.V):
-            if self.connected_matrix[v1, v2] == 1:
+            if self.regions.find(v2) == root:
                 yield v2
 
     @property
@@ -115,9 +127,24 @@ class Room(Rect):
 
 
 class Dungeon:
-    def __init__(self, map_settings: dict):
+    """
+    Args:
+        map_settings: see const.MAP_SETTINGS
+        rng: random number generator used for every random choice while building,
+            defaults to the module level generator so random.seed() keeps working
+        backend: GridBackend for the GameMap, to use compact or memory-mapped grids on very large maps
+
+    Attributes:
+        dungeon: the GameMap being built
+        rooms: rooms in the order they were placed
+        corridors: corridor tiles in the order they were carved
+        entities: entities placed by place_entities, the player first
+        entity_index: EntityIndex over entities
+    """
 
-        self.dungeon = GameMap(height=map_settings["map_height"], width=map_settings["map_width"])
+    def __init__(self, map_settings: dict, rng: random.Random = None, backend: GridBackend = None):
+
+        self.dungeon = GameMap(height=map_settings["map_height"], width=map_settings["map_width"], backend=backend)
 
         self.current_region: int = -1
 
@@ -130,12 +157,16 @@ class Dungeon:
         self.winding_percent: int = 20
 
         self.seed = None
+        self.rng = random if rng is None else rng
+
+        self.free_space: FreeSpaceTable = None
 
         self.region_graph = None
         self.connector_regions = None
         self.joined_regions = None
 
         self.entities = None
+        self.entity_index: EntityIndex = None
 
     @property
     def starting_position(self) -> Point:
@@ -158,13 +189,13 @@ class Dungeon:
         """
         increases current_region by 1 and then returns current_region
         """
+        if self.current_region >= self.dungeon.max_regions:
+            raise OverflowError(f"region_grid cannot hold more than {self.dungeon.max_regions} regions")
         self.current_region += 1
         return self.current_region
 
     def initialize_map(self):
-        for y in self.dungeon.rows:
-            for x in self.dungeon.columns:
-                self.dungeon.place(Point(x, y), Tile.wall(Point(x, y)), region=-1)
+        self.dungeon.place_area(0, 0, self.dungeon.width, self.dungeon.height, TILE_KINDS[TileType.WALL], region=-1)
 
     # TODO: refactor self.tile to take Point
     def tile(self, x: int, y: int) -> Tile:
@@ -212,10 +243,10 @@ class Dungeon:
         if self.room_fits(room, margin) or ignore_overlap:
             region = self.new_region()
             room.region = region
-            for point in room:
+            self.dungeon.place_area(room.x, room.y, room.width, room.height, TILE_KINDS[TileType.FLOOR], region)
 
-                tile = Tile.floor(point)
-                self.dungeon.place(point, tile, region)
+            if self.free_space is not None:
+                self.free_space.update(self.dungeon.label_grid, start_x, start_y, room_width, room_height)
 
             self.rooms.append(room)
 
@@ -226,9 +257,15 @@ class Dungeon:
         room_step: int = 2,
         margin: int = None,
         attempts: int = 1000,
+        sampling: str = None,
     ):
         """
-
+        "random" sampling picks any point on the map and lets place_room reject rooms that do not fit
+        "free_space" sampling keeps a FreeSpaceTable of label_grid and only picks from the positions where a room
+        of the drawn size fits, so far fewer attempts are wasted on crowded maps
+        both are deterministic for a given seed, and in both an accepted room of a given size is uniformly
+        distributed over the positions where it fits; with "free_space" every attempt whose size fits somewhere
+        places a room, so sizes are drawn exactly as randrange gives them instead of favouring sizes that fit often
         :param min_room_size: minimum number of tiles
         :type min_room_size: int
         :param max_room_size: 
@@ -239,48 +276,54 @@ class Dungeon:
         :type margin: int
         :param attempts: number of times 
         :type attempts: int
+        :param sampling: "random" or "free_space", defaults to map_settings["room_sampling"]
+        :type sampling: str
         """
         if margin is None:
             margin = self.map_settings["room_margin"]
+        if sampling is None:
+            sampling = self.map_settings.get("room_sampling", "random")
+        if sampling == "free_space":
+            self.free_space = FreeSpaceTable(self.dungeon.label_grid)
+        elif sampling != "random":
+            raise ValueError(f"unknown room sampling: {sampling}")
+
         for _ in range(attempts):
             if len(self.rooms) >= self.max_rooms:
                 break
-            room_width = randrange(min_room_size, max_room_size, room_step)
-            room_height = randrange(min_room_size, max_room_size, room_step)
-            start_point = self.random_point()
+            room_width = self.rng.randrange(min_room_size, max_room_size, room_step)
+            room_height = self.rng.randrange(min_room_size, max_room_size, room_step)
+            if self.free_space is not None:
+                start_point = self.random_free_point(room_width, room_height, margin)
+                if start_point is None:
+                    continue
+            else:
+                start_point = self.random_point()
             self.place_room(
                 start_point.x, start_point.y, room_width, room_height, margin
             )
 
+        # the table is only kept in sync by place_room, so drop it before the maze is carved
+        self.free_space = None
+
     def room_fits(self, room: Room, margin: int, simple: bool = False) -> bool:
         """
-
-        :param room: 
+        checks the room, expanded by margin on every side, against a slice of label_grid
+        :param room:
         :type room: Room
-        :param margin: 
+        :param margin:
         :type margin: int
-        :return: 
+        :return: True if the expanded room is inside the map and only covers walls
         :rtype: bool
         """
-        mar_room = Room(
-            (room.x - margin),
-            (room.y - margin),
-            (room.width + margin * 2),
-            (room.height + margin * 2),
-        )
-
-        if (
-            mar_room.x + mar_room.width < self.width
-            and mar_room.y + mar_room.height < self.height
-            and mar_room.x >= 0
-            and mar_room.y >= 0
-        ):
-            for x, y in mar_room:
-                tile = self.tile(x, y)
-                if tile.label is not TileType.WALL:
-                    return False
-
-            return True
+        left = room.x - margin
+        top = room.y - margin
+        right = left + room.width + margin * 2
+        bottom = top + room.height + margin * 2
+
+        if right < self.width and bottom < self.height and left >= 0 and top >= 0:
+            # TileType.WALL is 0, so any non-zero label means the space is taken
+            return not self.dungeon.label_grid[left:right, top:bottom].any()
         return False
 
     def grow_maze(self, start: Point, label: TileType = None):
@@ -323,7 +366,7 @@ class Dungeon:
 
                 if (
                     last_direction in open_tiles
-                    and randint(1, 101) > self.winding_percent
+                    and self.rng.randint(1, 101) > self.winding_percent
                 ):
 
                     current_direction = last_direction
@@ -331,7 +374,7 @@ class Dungeon:
                 else:
                     # TODO: refactor for random.choice()
                     current_direction = open_tiles[
-                        randint(0, len(open_tiles) - 1)
+                        self.rng.randint(0, len(open_tiles) - 1)
                     ]
 
                 self.place_tile(tile + current_direction, region=region, label=label)
@@ -399,23 +442,22 @@ class Dungeon:
 
     def carve(self, point: Point, region: int, label: TileType = TileType.FLOOR):
 
-        tile = Tile.from_label(point, label)
-        self.dungeon.place(point, tile, region)
+        self.dungeon.place(point, TILE_KINDS[label], region)
 
     def build_corridors(self, start_point: Point = None):
         cells = []
         if start_point is None:
             start_point = Point(
-                x=randint(1, self.width - 2),
-                y=randint(1, self.height - 2),
+                x=self.rng.randint(1, self.width - 2),
+                y=self.rng.randint(1, self.height - 2),
             )
             # TODO: refactor can_carve
         attempts = 0
         while not self.can_carve(start_point, Direction.self()):
             attempts += 1
             start_point = Point(
-                x=randint(1, self.width - 2),
-                y=randint(1, self.height - 2),
+                x=self.rng.randint(1, self.width - 2),
+                y=self.rng.randint(1, self.height - 2),
             )
             # TODO: need to remove this hard stop once everything is combined
             if attempts > 100:
@@ -432,7 +474,7 @@ class Dungeon:
             start_point = cells[-1]
             possible_moves = self.possible_moves(start_point)
             if possible_moves:
-                point = choice(possible_moves)
+                point = self.rng.choice(possible_moves)
                 self.carve(
                     point=point, region=self.current_region, label=TileType.CORRIDOR
                 )
@@ -480,10 +522,23 @@ class Dungeon:
 
     def random_point(self) -> Point:
         return Point(
-            x=randint(0, self.dungeon.width),
-            y=randint(0, self.dungeon.height),
+            x=self.rng.randint(0, self.dungeon.width),
+            y=self.rng.randint(0, self.dungeon.height),
         )
 
+    def random_free_point(self, room_width: int, room_height: int, margin: int) -> Point:
+        """
+        picks a random top left corner where a room of the given size fits, using self.free_space
+        :return: top left corner for the room, or None if the room fits nowhere
+        :rtype: Point
+        """
+        count = self.free_space.count_fitting_positions(room_width, room_height, margin)
+        if count == 0:
+            return None
+        n = self.rng.randrange(count)
+        x, y = self.free_space.nth_fitting_position(room_width, room_height, margin, n)
+        return Point(x, y)
+
     def build_dungeon(self):
         self.initialize_map()
         self.place_random_rooms(
@@ -491,6 +546,16 @@ class Dungeon:
             max_room_size=self.map_settings["max_room_size"],
         )
 
+        self.grow_mazes()
+
+        self.connect_regions()
+
+        self.remove_dead_ends()
+
+    def grow_mazes(self):
+        """
+        grows a maze from every wall tile left inside the map border
+        """
         for y in range(1, self.height - 1):
             for x in range(1, self.width - 1):
                 point = Point(x, y)
@@ -498,10 +563,6 @@ class Dungeon:
                     continue
                 self.grow_maze(point)
 
-        self.connect_regions()
-
-        self.remove_dead_ends()
-
     def find_empty_space(self, distance: int) -> Point:
         for x in range(distance, self.width - distance):
             for y in range(distance, self.height - distance):
@@ -536,16 +597,20 @@ class Dungeon:
             print("get_extents else statement")
             print(f"Direction not valid: point={point}, direction={direction}")
 
-    @logger.catch()
+    @catch
     def place_tile(self, point: Point, label: TileType, region: int):
-        tile = Tile.from_label(point, label)
+        kind = TILE_KINDS[label]
         x, y = point
+        if self.dungeon.fov_cache is not None and self.dungeon.transparent[x, y] != kind.transparent:
+            self.dungeon.fov_cache.invalidate(x, y)
         self.dungeon.label_grid[x, y] = label.value
-        self.dungeon.walkable[x, y] = tile.walkable
-        self.dungeon.transparent[x, y] = tile.transparent
+        self.dungeon.walkable[x, y] = kind.walkable
+        self.dungeon.transparent[x, y] = kind.transparent
         self.dungeon.region_grid[x, y] = region
+        for listener in self.dungeon.change_listeners:
+            listener(x, y, 1, 1)
 
-    @logger.catch()
+    @catch
     def can_place(self, point: Point, direction: Point) -> bool:
         top_left, bottom_right = self.get_extents(point, direction)
 
@@ -562,91 +627,118 @@ class Dungeon:
                     return False
         return True
 
-    def find_connectors(self):
-        connector_regions = dict()
-        for point, tile in self.dungeon:
-            if tile.label != TileType.WALL:
-                continue
-
-            regions = set()
+    def find_connectors(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        finds every wall tile that borders two or more distinct regions, using shifted views of region_grid
+        a tile bordering more than two regions is listed once for every pair of them
+        :return: (n, 2) array of connector x- and y-coordinates and (n, 2) array of the regions each one joins,
+            smaller region first, ordered by y and then x like iterating the GameMap
+        :rtype: Tuple[np.ndarray, np.ndarray]
+        """
+        regions = np.pad(self.dungeon.region_grid, 1, mode="constant", constant_values=-1)
+        neighbors = np.sort(
+            np.stack(
+                [
+                    regions[1:-1, 2:],  # N
+                    regions[2:, 1:-1],  # E
+                    regions[1:-1, :-2],  # S
+                    regions[:-2, 1:-1],  # W
+                ]
+            ),
+            axis=0,
+        )
+        # after sorting, a neighbor is distinct if it is in a region and differs from the one before it
+        distinct = neighbors > -1
+        distinct[1:] &= neighbors[1:] != neighbors[:-1]
+        walls = self.dungeon.label_grid == TileType.WALL.value
 
-            for neighbor in [point.N, point.E, point.W, point.S]:
-                if not self.dungeon.in_bounds(neighbor):
-                    continue
-                region = self.dungeon.region(neighbor)
-                if region > -1:
-                    regions.add(region)
+        xs, ys, pairs, order = [], [], [], []
+        for i, j in combinations(range(len(neighbors)), 2):
+            x, y = np.nonzero(walls & distinct[i] & distinct[j])
+            xs.append(x)
+            ys.append(y)
+            pairs.append(np.stack([neighbors[i][x, y], neighbors[j][x, y]], axis=1))
+            order.append(np.full_like(x, len(order)))
 
-            if len(regions) < 2:
-                continue
+        xs, ys, order = np.concatenate(xs), np.concatenate(ys), np.concatenate(order)
+        sort = np.lexsort((order, xs, ys))
 
-            connector_regions[point] = regions
-        return connector_regions
+        points = np.stack([xs, ys], axis=1)[sort]
+        return points, np.concatenate(pairs)[sort]
 
     def connect_regions(self):
+        """
+        grows the main region out from a random start region, one connector at a time
+        every connector touching the main region goes into a frontier and is drawn from it at random;
+        a connector leading to a new region becomes a door and adds that region's connectors to the frontier,
+        one joining two merged regions becomes an extra door with a 1 in extra_door_chance + 1 chance,
+        unless it is next to a door already
+        each connector is drawn at most twice, so this runs in near-linear time in the number of connectors
+        a region left with no connector to the main region, like a room walled off by two walls, is joined by
+        carving a bridge to the nearest merged region, and growing goes on from its connectors
+        """
         # self.joined_regions = set()
-        connector_regions = self.find_connectors()
-
-        regions_connectors = defaultdict(list)
-        region_neighbors = defaultdict(list)
-        for c, (r1, r2) in connector_regions.items():
-            region_pair = (min(r1, r2), max(r1, r2))
-            regions_connectors[region_pair].append(c)
-            region_neighbors[r1].append(r2)
-            region_neighbors[r2].append(r1)
-
-        all_connectors = list(connector_regions.keys())
-
         # choose random room to begin set for main region
-        start_region = randint(0, len(self.rooms))
+        start_region = self.rng.randint(0, len(self.rooms))
         # initialize region graph
         g = RegionGraph(self.current_region + 1, start_region)
-        # add edges to graph
-        for p, (r1, r2) in connector_regions.items():
-            g.add_edge(r1, r2, p)
-
-        while all_connectors:
-
-            neighbors = [
-                n for r in g.merged_regions for n in g.find_neighbors(r)
-            ]
-
-            # choose random neighbor
-            neighbor = choice(neighbors)
-            # get connecting points between merged regions and neighbor
-            poss_connections = [
-                point for r in g.merged_regions for point in regions_connectors[(min(r, neighbor), max(r, neighbor))]
-            ]
-            # choose random connecting point
-            if poss_connections:
-                chosen_connection = choice(poss_connections)
-                # place connection at point connecting the regions
-                self.place_connection(chosen_connection, start_region)
-                # add neighbor to merged region
-                g.join_regions(neighbor, chosen_connection)
-            else:
-                print(f"poss_connections was empty, neighbor={neighbor}")
-                chosen_connection = Point(0, 0)
-            # for every point all connectors
-            remove_list = set()
-            for point in all_connectors:
-                r1, r2 = connector_regions.get(point, [-1, -1])
-                if point.distance(chosen_connection) <= 1:
-                    pass
-                elif r1 in g.merged_regions and r2 in g.merged_regions:
-                    if randint(0, self.map_settings["extra_door_chance"]) == 0:
-                        self.place_connection(chosen_connection, start_region)
-                        g.join_regions(r1, point)
-                        g.join_regions(r2, point)
-                else:
-                    # still not connected to merged region
+
+        connector_regions: Dict[Point, Tuple[int, int]] = dict()
+        points, pairs = self.find_connectors()
+        for (x, y), (r1, r2) in zip(points.tolist(), pairs.tolist()):
+            point = Point(x, y)
+            connector_regions.setdefault(point, (r1, r2))
+            # add edges to graph
+            g.add_edge(r1, r2, point)
+
+        extra_door_chance = self.map_settings["extra_door_chance"]
+        doors: Set[Point] = set()
+        drawn: Set[int] = set()
+        frontier = list(g.adjacency[start_region])
+        regions = np.unique(self.dungeon.region_grid)
+        unjoined = [int(region) for region in regions[regions >= 0]]
+
+        while frontier or unjoined:
+            if not frontier:
+                unjoined = [region for region in unjoined if not g.is_merged(region)]
+                if not unjoined:
+                    break
+                bridge = self.find_bridge(unjoined[0], g.is_merged)
+                if not bridge:
+                    print(f"region {unjoined[0]} can't be bridged to the main region")
+                    break
+                self.place_bridge(bridge, start_region)
+                doors.update((bridge[0], bridge[-1]))
+                g.join_regions(unjoined[0], bridge[0])
+                frontier.extend(g.adjacency[unjoined[0]])
+                continue
+
+            # swap a random connector to the end so it can be popped in O(1)
+            i = self.rng.randrange(len(frontier))
+            frontier[i], frontier[-1] = frontier[-1], frontier[i]
+            edge = frontier.pop()
+            if edge in drawn:
+                continue
+            drawn.add(edge)
+
+            r1, r2, point = g.edges[edge]
+            if g.is_merged(r1) and g.is_merged(r2):
+                if point in doors or any(neighbor in doors for neighbor in point.direct_neighbors):
                     continue
-                remove_list.add(point)
-            for p in remove_list:
-                if p in all_connectors:
-                    all_connectors.remove(p)
-                else:
-                    print(f"failed to remove {p} from all_connectors")
+                if self.rng.randint(0, extra_door_chance) == 0:
+                    self.place_connection(point, start_region)
+                    doors.add(point)
+                    g.connection_points.add(point)
+                continue
+
+            neighbor = r2 if g.is_merged(r1) else r1
+            # a connector bordering three regions may already be a door
+            if point not in doors:
+                self.place_connection(point, start_region)
+                doors.add(point)
+            # add neighbor to merged region
+            g.join_regions(neighbor, point)
+            frontier.extend(g.adjacency[neighbor])
 
         joined_regions = {
             c for c in g.find_connections(start_region)
@@ -669,6 +761,47 @@ class Dungeon:
         #     if region not in self.joined_regions:
         #         print(f"region {region} not joined, but why?")
 
+    def find_bridge(self, region: int, is_merged: Callable[[int], bool]) -> List[Point]:
+        """
+        finds the shortest run of wall tiles inside the map border from region to a tile of a merged region
+        :param region: region to bridge from
+        :type region: int
+        :param is_merged: tells if a region is part of the main region
+        :type is_merged: Callable[[int], bool]
+        :return: the wall tiles, starting next to region, empty if no merged region can be reached
+        :rtype: List[Point]
+        """
+        labels, regions = self.dungeon.label_grid, self.dungeon.region_grid
+        xs, ys = np.nonzero(regions == region)
+        came_from: Dict[Point, Optional[Point]] = {Point(x, y): None for x, y in zip(xs.tolist(), ys.tolist())}
+        queue = deque(came_from)
+
+        while queue:
+            point = queue.popleft()
+            for neighbor in point.direct_neighbors:
+                x, y = neighbor
+                if neighbor in came_from or not (0 < x < self.width - 1 and 0 < y < self.height - 1):
+                    continue
+                came_from[neighbor] = point
+                if labels[x, y] == TileType.WALL.value:
+                    queue.append(neighbor)
+                elif regions[x, y] >= 0 and is_merged(int(regions[x, y])):
+                    bridge = []
+                    while labels[point.x, point.y] == TileType.WALL.value:
+                        bridge.append(point)
+                        point = came_from[point]
+                    return bridge[::-1]
+        return []
+
+    def place_bridge(self, bridge: List[Point], region: int):
+        """
+        opens a run of wall tiles from find_bridge: a door at each end and corridor between them
+        """
+        for point in bridge[1:-1]:
+            self.place_tile(point, TileType.CORRIDOR, region)
+        for point in (bridge[0], bridge[-1]):
+            self.place_connection(point, region)
+
     def place_connection(self, point, region):
         # if random.randint(1, 4) == 1:
         #     label = TileType.DOOR_OPEN
@@ -697,25 +830,43 @@ class Dungeon:
         self.region_graph = g
 
     def remove_dead_ends(self):
-        dead_ends = self.dead_ends
-        while dead_ends:
-            point = dead_ends.pop(-1)
+        """
+        fills dead ends with walls until none are left
+        always fills the dead end that comes last in self.corridors, then only re-checks its neighbors,
+        since filling a tile can only turn the corridors next to it into new dead ends
+        """
+        # corridor tiles still open, mapped to their index in self.corridors
+        open_corridors: Dict[Point, int] = {point: i for i, point in enumerate(self.corridors)}
+        # max-heap on the corridor index
+        queue = [(-open_corridors[point], point) for point in self.dead_ends]
+        heapq.heapify(queue)
+
+        while queue:
+            _, point = heapq.heappop(queue)
+            if point not in open_corridors:
+                continue
             self.place_tile(point, TileType.WALL, -1)
-            self.corridors.remove(point)
+            del open_corridors[point]
+
+            for neighbor in point.direct_neighbors:
+                if neighbor in open_corridors and self.is_dead_end(neighbor):
+                    heapq.heappush(queue, (-open_corridors[neighbor], neighbor))
 
-            dead_ends = self.dead_ends
+        self.corridors = [point for point in self.corridors if point in open_corridors]
+
+    def is_dead_end(self, point: Point) -> bool:
+        walls = 0
+        for x, y in point.direct_neighbors:
+            if self.dungeon.label_grid[x, y] == TileType.WALL.value:
+                walls += 1
+        return walls >= 3
 
     @property
     def dead_ends(self):
         dead_ends = []
         # iterate through corridors
         for point in self.corridors:
-            walls = 0
-            for neighbor in point.direct_neighbors:
-                tile = self.tile(*neighbor)
-                if tile.label == TileType.WALL:
-                    walls += 1
-            if walls >= 3:
+            if self.is_dead_end(point):
                 dead_ends.append(point)
 
         return dead_ends
@@ -729,22 +880,23 @@ class Dungeon:
     def place_entities(self, player: Entity) -> List[Entity]:
         max_monsters_per_room = self.map_settings["max_monsters_per_room"]
 
-        self.entities = [player]
+        self.entity_index = EntityIndex(self.width, self.height, [player])
+        self.entities = self.entity_index.entities
 
         for room in self.rooms[1:]:
-            number_of_monsters = randint(0, max_monsters_per_room)
+            number_of_monsters = self.rng.randint(0, max_monsters_per_room)
 
             for i in range(number_of_monsters):
-                x = randint(room.left, room.right)
-                y = randint(room.top, room.bottom)
+                x = self.rng.randint(room.left, room.right)
+                y = self.rng.randint(room.top, room.bottom)
                 point = Point(x, y)
 
-                if not any([entity for entity in self.entities if entity.position == point]):
-                    if randint(0, 100) < 80:
+                if not self.entity_index.at(point):
+                    if self.rng.randint(0, 100) < 80:
                         monster = Entity(name="goblin", position=point, char=Tiles.GOBLIN, blocks=True)
                     else:
                         monster = Entity(name="orc", position=point, char=Tiles.ORC, blocks=True)
 
-                    self.entities.append(monster)
+                    self.entity_index.add(monster)
 
         return self.entities
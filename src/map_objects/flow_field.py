@@ -0,0 +1,114 @@
+from typing import Callable, Optional, Tuple
+
+import numpy
+import tcod.path
+
+from map_objects.point import Point
+
+NEIGHBORS = ((-1, -1), (0, -1), (1, -1), (-1, 0), (1, 0), (-1, 1), (0, 1), (1, 1))
+
+
+class FlowField:
+    """
+    Walking distance to a target from every cell within radius of it, so any number of entities can head for the
+    target by stepping to their lowest neighbour instead of each searching for a path
+
+    The field is only recomputed, with tcod's Dijkstra over the radius box, when it is next used after the target
+    moved or a cell inside the box changed.
+
+    Args:
+        game_map whose walkable grid is walked, the field listens to its change_listeners
+        radius: half the size of the box around the target the field covers, 0 for the whole map
+        cardinal and diagonal: cost of a straight and of a diagonal step, 0 for no diagonal steps
+
+    Attributes:
+        target: cell distances are measured to
+        box: x, y, width and height of the area covered
+        distance: distance to target of each cell in box, indexed [x, y] from the box's corner, UNREACHABLE if
+            target can't be reached from it without leaving the box
+        stale: True if distance has to be recomputed before it is read
+    """
+
+    UNREACHABLE = int(numpy.iinfo(numpy.int32).max)
+
+    def __init__(self, game_map, radius: int = 0, cardinal: int = 2, diagonal: int = 3):
+        self.game_map = game_map
+        self.radius: int = radius
+        self.cardinal: int = cardinal
+        self.diagonal: int = diagonal
+
+        self.target: Optional[Point] = None
+        self.box: Tuple[int, int, int, int] = (0, 0, 0, 0)
+        self.distance = numpy.zeros((0, 0), dtype=numpy.int32)
+        self.stale: bool = True
+        self.computed: int = 0
+
+        game_map.change_listeners.append(self.map_changed)
+
+    def detach(self):
+        self.game_map.change_listeners.remove(self.map_changed)
+
+    def set_target(self, target: Point):
+        if target != self.target:
+            self.target = target
+            self.stale = True
+
+    def map_changed(self, x: int, y: int, width: int, height: int):
+        box_x, box_y, box_width, box_height = self.box
+        if box_x < x + width and x < box_x + box_width and box_y < y + height and y < box_y + box_height:
+            self.stale = True
+
+    def compute(self):
+        x, y = self.target.x, self.target.y
+        self.box = self.game_map.fov_box(x, y, self.radius)
+        box_x, box_y, width, height = self.box
+        window = (slice(box_x, box_x + width), slice(box_y, box_y + height))
+
+        cost = self.game_map.walkable[window].astype(numpy.int32)
+        distance = numpy.full((width, height), self.UNREACHABLE, dtype=numpy.int32, order="F")
+        distance[x - box_x, y - box_y] = 0
+        tcod.path.dijkstra2d(distance, cost, self.cardinal, self.diagonal, out=distance)
+
+        self.distance = distance
+        self.stale = False
+        self.computed += 1
+
+    def distance_to_target(self, point: Point) -> int:
+        """
+        :return: walking distance from point to target, UNREACHABLE if point is outside the box or cut off
+        :rtype: int
+        """
+        if self.stale:
+            self.compute()
+        box_x, box_y, width, height = self.box
+        x, y = point.x - box_x, point.y - box_y
+        if 0 <= x < width and 0 <= y < height:
+            return int(self.distance[x, y])
+        return self.UNREACHABLE
+
+    def step(self, point: Point, is_blocked: Callable[[Point], bool] = None) -> Optional[Point]:
+        """
+        :param point: cell to step from
+        :type point: Point
+        :param is_blocked: tells which neighbours are taken, e.g. EntityIndex.is_blocked, the target never is
+        :return: the closest neighbour to target that is closer than point and not blocked, None if there is none
+        :rtype: Point
+        """
+        if self.stale:
+            self.compute()
+        box_x, box_y, width, height = self.box
+        x, y = point.x - box_x, point.y - box_y
+        if not (0 <= x < width and 0 <= y < height):
+            return None
+
+        distance = self.distance
+        best, best_distance = None, int(distance[x, y])
+        for dx, dy in NEIGHBORS:
+            neighbor_x, neighbor_y = x + dx, y + dy
+            if 0 <= neighbor_x < width and 0 <= neighbor_y < height:
+                neighbor_distance = int(distance[neighbor_x, neighbor_y])
+                if neighbor_distance < best_distance:
+                    neighbor = Point(neighbor_x + box_x, neighbor_y + box_y)
+                    if is_blocked is None or neighbor == self.target or not is_blocked(neighbor):
+                        best, best_distance = neighbor, neighbor_distance
+        return best
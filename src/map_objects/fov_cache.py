@@ -0,0 +1,88 @@
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+import numpy
+
+# origin x, origin y, radius, light_walls, algorithm
+FovKey = Tuple[int, int, int, bool, int]
+# x, y, width, height of the area an fov result covers
+Box = Tuple[int, int, int, int]
+
+
+class FovCache:
+    """
+    Least recently used cache of fov results, each stored bit-packed and cropped to its radius box
+
+    A result only depends on the transparent cells inside its box, so invalidate() drops the entries whose box
+    overlaps a changed area and leaves the rest.
+
+    Args:
+        max_bytes the packed results may take up before the least recently used are evicted
+
+    Attributes:
+        entries: key -> (box, packed fov) in least to most recently used order
+        nbytes: bytes taken up by the packed results
+        hits and misses of get()
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes: int = max_bytes
+        self.entries: OrderedDict = OrderedDict()
+        self.nbytes: int = 0
+        self.hits: int = 0
+        self.misses: int = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key: FovKey) -> Optional[numpy.ndarray]:
+        """
+        :return: the fov inside the key's box, or None if it isn't cached
+        :rtype: numpy.ndarray
+        """
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+
+        (_, _, width, height), packed = entry
+        return numpy.unpackbits(packed, count=width * height).reshape((width, height)).view(numpy.bool_)
+
+    def put(self, key: FovKey, box: Box, fov: numpy.ndarray):
+        """
+        :param box: x, y, width and height of the area fov covers
+        :param fov: fov inside box, indexed [x, y]
+        """
+        if key in self.entries:
+            self._drop(key)
+        packed = numpy.packbits(fov, axis=None)
+        self.entries[key] = (box, packed)
+        self.nbytes += packed.nbytes
+
+        while self.nbytes > self.max_bytes and len(self.entries) > 1:
+            self._drop(next(iter(self.entries)))
+
+    def invalidate(self, x: int, y: int, width: int = 1, height: int = 1) -> int:
+        """
+        drops every entry whose box overlaps the area, called when transparent cells in it change
+        :return: number of entries dropped
+        :rtype: int
+        """
+        stale = [
+            key
+            for key, ((box_x, box_y, box_width, box_height), _) in self.entries.items()
+            if box_x < x + width and x < box_x + box_width and box_y < y + height and y < box_y + box_height
+        ]
+        for key in stale:
+            self._drop(key)
+        return len(stale)
+
+    def clear(self):
+        self.entries.clear()
+        self.nbytes = 0
+
+    def _drop(self, key: FovKey):
+        _, packed = self.entries.pop(key)
+        self.nbytes -= packed.nbytes
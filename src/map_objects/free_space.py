@@ -0,0 +1,147 @@
+import numpy as np
+
+from typing import Dict, Tuple
+
+from map_objects.tile import TileType
+
+
+class FreeSpaceTable:
+    """
+    A summed-area table (integral image) of the non-wall cells in a label grid
+
+    Args:
+        label_grid to build the table from, indexed [x, y]
+
+    Attributes:
+        table: padded integral image, table[x, y] is the number of non-wall cells in label_grid[:x, :y]
+        free_blocks: cached masks of the all-wall blocks for each (width, height) asked for so far
+    """
+
+    def __init__(self, label_grid: np.ndarray):
+        width, height = label_grid.shape
+        self.table = np.zeros((width + 1, height + 1), dtype=np.int64)
+        occupied = label_grid != TileType.WALL.value
+        self.table[1:, 1:] = occupied.cumsum(axis=0).cumsum(axis=1)
+        self.free_blocks: Dict[Tuple[int, int], np.ndarray] = {}
+
+    @property
+    def width(self) -> int:
+        return self.table.shape[0] - 1
+
+    @property
+    def height(self) -> int:
+        return self.table.shape[1] - 1
+
+    def block_sums(self, width: int, height: int, x0: int = 0, y0: int = 0, x1: int = None, y1: int = None) -> np.ndarray:
+        """
+        counts the non-wall cells of width x height blocks that fit inside the grid
+        x0, x1, y0 and y1 limit the result to blocks with their top left corner in [x0, x1) x [y0, y1)
+        :param width: number of tiles the block spans
+        :type width: int
+        :param height: number of tiles the block spans
+        :type height: int
+        :return: array indexed [x - x0, y - y0] by the top left corner of each block
+        :rtype: np.ndarray
+        """
+        if x1 is None:
+            x1 = self.width - width + 1
+        if y1 is None:
+            y1 = self.height - height + 1
+        t = self.table
+        return (
+            t[x0 + width:x1 + width, y0 + height:y1 + height]
+            - t[x0:x1, y0 + height:y1 + height]
+            - t[x0 + width:x1 + width, y0:y1]
+            + t[x0:x1, y0:y1]
+        )
+
+    def free_block_mask(self, width: int, height: int) -> np.ndarray:
+        """
+        marks the top left corners of all-wall width x height blocks, kept up to date by update()
+        :return: boolean array indexed [x, y] by the top left corner of each block
+        :rtype: np.ndarray
+        """
+        key = (width, height)
+        if key not in self.free_blocks:
+            self.free_blocks[key] = self.block_sums(width, height) == 0
+        return self.free_blocks[key]
+
+    def fitting_mask(self, room_width: int, room_height: int, margin: int) -> np.ndarray:
+        """
+        marks every top left corner, offset by margin, where a room plus margin only covers walls
+        matches the bounds used by Dungeon.room_fits, which keeps the margin off the right and bottom edge
+        :param room_width: number of tiles the room spans
+        :type room_width: int
+        :param room_height: number of tiles the room spans
+        :type room_height: int
+        :param margin: number of wall tiles kept around the room
+        :type margin: int
+        :return: boolean view indexed [x - margin, y - margin] by the top left corner of the room
+        :rtype: np.ndarray
+        """
+        outer_width = room_width + margin * 2
+        outer_height = room_height + margin * 2
+        if outer_width >= self.width or outer_height >= self.height:
+            return np.zeros((0, 0), dtype=bool)
+
+        # drop the last row and column so the margin never touches the map edge
+        return self.free_block_mask(outer_width, outer_height)[:-1, :-1]
+
+    def fitting_positions(self, room_width: int, room_height: int, margin: int) -> np.ndarray:
+        """
+        :return: (n, 2) array of every room top left corner that fits, ordered by x and then y
+        :rtype: np.ndarray
+        """
+        return np.argwhere(self.fitting_mask(room_width, room_height, margin)) + margin
+
+    def count_fitting_positions(self, room_width: int, room_height: int, margin: int) -> int:
+        return int(np.count_nonzero(self.fitting_mask(room_width, room_height, margin)))
+
+    def nth_fitting_position(self, room_width: int, room_height: int, margin: int, n: int) -> Tuple[int, int]:
+        """
+        same as fitting_positions(...)[n] without building the whole list of positions
+        :return: x- and y-coordinate of the top left corner of the room
+        :rtype: Tuple[int, int]
+        """
+        mask = self.fitting_mask(room_width, room_height, margin)
+        per_column = np.count_nonzero(mask, axis=1).cumsum()
+        x = int(np.searchsorted(per_column, n, side="right"))
+        before = int(per_column[x - 1]) if x > 0 else 0
+        y = int(np.flatnonzero(mask[x])[n - before])
+        return x + margin, y + margin
+
+    def update(self, label_grid: np.ndarray, x: int, y: int, width: int, height: int):
+        """
+        brings the table up to date after the cells in the given rectangle changed
+        only the part of the table below and to the right of the rectangle is touched
+        :param label_grid: label grid the table was built from, already holding the new labels
+        :type label_grid: np.ndarray
+        :param x: x-coordinate of the top left corner of the changed rectangle
+        :type x: int
+        :param y: y-coordinate of the top left corner of the changed rectangle
+        :type y: int
+        :param width: number of tiles the rectangle spans
+        :type width: int
+        :param height: number of tiles the rectangle spans
+        :type height: int
+        """
+        t = self.table
+        width = min(width, self.width - x)
+        height = min(height, self.height - y)
+        if width <= 0 or height <= 0:
+            return
+
+        old = np.diff(np.diff(t[x:x + width + 1, y:y + height + 1], axis=0), axis=1)
+        new = label_grid[x:x + width, y:y + height] != TileType.WALL.value
+
+        delta = np.zeros((self.width - x, self.height - y), dtype=np.int64)
+        delta[:width, :height] = new.astype(np.int64) - old
+        t[x + 1:, y + 1:] += delta.cumsum(axis=0).cumsum(axis=1)
+
+        # only blocks overlapping the rectangle can have changed
+        for (block_width, block_height), mask in self.free_blocks.items():
+            x0 = max(x - block_width + 1, 0)
+            y0 = max(y - block_height + 1, 0)
+            x1 = min(x + width, mask.shape[0])
+            y1 = min(y + height, mask.shape[1])
+            mask[x0:x1, y0:y1] = self.block_sums(block_width, block_height, x0, y0, x1, y1) == 0
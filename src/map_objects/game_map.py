@@ -1,24 +1,59 @@
 import numpy
-from loguru import logger
+from tcod.constants import FOV_RESTRICTIVE
+from tcod.los import bresenham
 from tcod.map import Map
-from typing import Dict, Tuple, Iterable, List
+from typing import Callable, Dict, Tuple, Iterable, List, Optional, Sequence, Union
 
+from map_objects.flow_field import FlowField
+from map_objects.fov_cache import FovCache
+from map_objects.grid_backend import GridBackend
 from map_objects.point import Point
-from map_objects.tile import Tile, TileType
+from map_objects.tile import Tile, TileKind, TileType
 
 Grids = Dict[str, int]
 
 
 class GameMap(Map):
-    def __init__(self, height: int, width: int):
+    """
+    Args:
+        height and width of the map
+        backend: allocates label_grid, region_grid and explored_grid, defaults to in-memory numpy.int grids
+        max_regions: number of regions region_grid has to hold, defaults to one per cell
+
+    Attributes:
+        newly_explored: (x, y, width, height) bounding box of the cells the last compute_fov explored for the
+            first time, None if it explored nothing new
+        fov_cache: if set, compute_fov reuses earlier results from it, see FovCache
+        change_listeners: called with (x, y, width, height) after place or place_area changes an area
+        flow_field: if set, a FlowField toward the player shared by every monster
+    """
+
+    def __init__(self, height: int, width: int, backend: GridBackend = None, max_regions: int = None):
         super(GameMap, self).__init__(width=width, height=height, order="F")
         self.height: int = height
         self.width: int = width
 
-        self.label_grid = numpy.full_like(self.walkable, 0, dtype=numpy.int)
-        self.region_grid = numpy.full_like(self.walkable, -1, dtype=numpy.int)
+        if backend is None:
+            backend = GridBackend(compact=False)
+        if max_regions is None:
+            max_regions = width * height
+        self.backend = backend
 
-        self.explored_grid = numpy.full_like(self.walkable, False, dtype=numpy.bool)
+        shape = self.walkable.shape
+        self.label_grid = backend.allocate("label", shape, backend.label_dtype, 0)
+        self.region_grid = backend.allocate("region", shape, backend.region_dtype(max_regions), -1)
+
+        self.explored_grid = backend.allocate("explored", shape, numpy.bool_, False)
+        self.newly_explored: Optional[Tuple[int, int, int, int]] = None
+        self.fov_cache: Optional[FovCache] = None
+        # every cell of fov outside this (x, y, width, height) box is False
+        self.fov_window: Tuple[int, int, int, int] = (0, 0, 0, 0)
+        self.change_listeners: List[Callable[[int, int, int, int], None]] = []
+        self.flow_field: Optional[FlowField] = None
+
+    @property
+    def max_regions(self) -> int:
+        return int(numpy.iinfo(self.region_grid.dtype).max)
 
     @property
     def rows(self):
@@ -28,6 +63,112 @@ class GameMap(Map):
     def columns(self):
         return range(self.width)
 
+    def compute_fov(
+        self, x: int, y: int, radius: int = 0, light_walls: bool = True, algorithm: int = FOV_RESTRICTIVE
+    ):
+        """
+        computes fov with tcod, or copies it from fov_cache, then marks every visible cell explored in one
+        operation over the radius box and keeps the bounding box of the cells explored for the first time in
+        newly_explored
+        """
+        box = self.fov_box(x, y, radius)
+        x0, y0, width, height = box
+        window = (slice(x0, x0 + width), slice(y0, y0 + height))
+
+        if self.fov_cache is None:
+            super(GameMap, self).compute_fov(x, y, radius, light_walls, algorithm)
+        else:
+            key = (x, y, radius, bool(light_walls), algorithm)
+            cached = self.fov_cache.get(key)
+            if cached is None:
+                super(GameMap, self).compute_fov(x, y, radius, light_walls, algorithm)
+                self.fov_cache.put(key, box, self.fov[window])
+            else:
+                # fov is a strided view into tcod's cell structs, so only clear where the last result could be
+                last_x, last_y, last_width, last_height = self.fov_window
+                self.fov[last_x:last_x + last_width, last_y:last_y + last_height] = False
+                self.fov[window] = cached
+        self.fov_window = box
+
+        visible = self.fov[window]
+        explored = self.explored_grid[window]
+
+        new = visible > explored
+        if not new.any():
+            self.newly_explored = None
+            return
+
+        columns = numpy.flatnonzero(new.any(axis=1))
+        rows = numpy.flatnonzero(new.any(axis=0))
+        self.newly_explored = (
+            x0 + int(columns[0]),
+            y0 + int(rows[0]),
+            int(columns[-1] - columns[0]) + 1,
+            int(rows[-1] - rows[0]) + 1,
+        )
+        explored |= new
+
+    def fov_box(self, x: int, y: int, radius: int) -> Tuple[int, int, int, int]:
+        """
+        :return: x, y, width and height of the part of the map an fov of radius from x, y can reach,
+            the whole map if radius is 0
+        :rtype: Tuple[int, int, int, int]
+        """
+        if radius <= 0:
+            return 0, 0, self.width, self.height
+        x0, y0 = max(x - radius, 0), max(y - radius, 0)
+        return x0, y0, min(x + radius + 1, self.width) - x0, min(y + radius + 1, self.height) - y0
+
+    def lines_of_sight(self, observers: Sequence[Point], targets: Sequence[Point], radius: int = 0) -> numpy.ndarray:
+        """
+        answers whether each observer can see each target in one batch:
+            pairs farther apart than radius are culled with one array operation
+            pairs on FLOOR cells of the same region are in the same room, an open rectangle, so they see each other
+                without casting a line
+            the rest cast a Bresenham line, once per distinct pair of cells even if several observers or targets
+                share one
+        :param observers: cells looked from
+        :type observers: Sequence[Point]
+        :param targets: cells looked at
+        :type targets: Sequence[Point]
+        :param radius: how far observers can see, 0 for no limit
+        :type radius: int
+        :return: visible[i, j] is True if observers[i] can see targets[j]
+        :rtype: numpy.ndarray
+        """
+        visible = numpy.zeros((len(observers), len(targets)), dtype=bool)
+        if not len(observers) or not len(targets):
+            return visible
+
+        observer_xy = numpy.array([(p.x, p.y) for p in observers], dtype=numpy.intp)
+        target_xy = numpy.array([(p.x, p.y) for p in targets], dtype=numpy.intp)
+        dx = observer_xy[:, 0, None] - target_xy[None, :, 0]
+        dy = observer_xy[:, 1, None] - target_xy[None, :, 1]
+        distance = dx * dx + dy * dy
+        candidates = distance <= radius * radius if radius > 0 else numpy.ones_like(visible)
+
+        observer_labels = self.label_grid[observer_xy[:, 0], observer_xy[:, 1]]
+        target_labels = self.label_grid[target_xy[:, 0], target_xy[:, 1]]
+        observer_regions = self.region_grid[observer_xy[:, 0], observer_xy[:, 1]]
+        target_regions = self.region_grid[target_xy[:, 0], target_xy[:, 1]]
+        same_room = (
+            (observer_labels[:, None] == TileType.FLOOR.value)
+            & (target_labels[None, :] == TileType.FLOOR.value)
+            & (observer_regions[:, None] == target_regions[None, :])
+        )
+        visible |= candidates & (same_room | (distance == 0))
+        candidates &= ~visible
+
+        transparent = self.transparent
+        lines: Dict[Tuple[int, int, int, int], bool] = {}
+        for i, j in zip(*numpy.nonzero(candidates)):
+            key = (*observer_xy[i].tolist(), *target_xy[j].tolist())
+            if key not in lines:
+                line = bresenham(key[:2], key[2:])[1:-1]
+                lines[key] = bool(transparent[line[:, 0], line[:, 1]].all())
+            visible[i, j] = lines[key]
+        return visible
+
     def in_fov(self, point: Point) -> bool:
         return self.fov[point.x, point.y]
 
@@ -50,23 +191,43 @@ class GameMap(Map):
                 yield point, Tile.from_grid(point, self.grids(point))
 
     # TODO: remove region in place, set region at place() call instead
-    def place(self, point: Point, tile: Tile, region: int):
+    def place(self, point: Point, tile: Union[Tile, TileKind], region: int):
         """
         assigns grid values for Tile at point with region
         :param point:
         :type point:
-        :param tile:
-        :type tile:
+        :param tile: Tile or TileKind to copy label, walkable and transparent from
+        :type tile: Union[Tile, TileKind]
         :param region:
         :type region:
         :return:
         :rtype:
         """
         x, y = point
+        if self.fov_cache is not None and self.transparent[x, y] != tile.transparent:
+            self.fov_cache.invalidate(x, y)
         self.label_grid[x, y] = tile.label.value
         self.walkable[x, y] = tile.walkable
         self.transparent[x, y] = tile.transparent
         self.region_grid[x, y] = region
+        for listener in self.change_listeners:
+            listener(x, y, 1, 1)
+
+    def place_area(self, x: int, y: int, width: int, height: int, tile: Union[Tile, TileKind], region: int):
+        """
+        assigns grid values for every cell of a rectangle with slices instead of one call per cell
+        :param tile: Tile or TileKind to copy label, walkable and transparent from
+        :type tile: Union[Tile, TileKind]
+        """
+        area = (slice(x, x + width), slice(y, y + height))
+        if self.fov_cache is not None and (self.transparent[area] != tile.transparent).any():
+            self.fov_cache.invalidate(x, y, width, height)
+        self.label_grid[area] = tile.label.value
+        self.walkable[area] = tile.walkable
+        self.transparent[area] = tile.transparent
+        self.region_grid[area] = region
+        for listener in self.change_listeners:
+            listener(x, y, width, height)
 
     def grids(self, point: Point) -> Dict[str, int]:
         grids = dict(
@@ -0,0 +1,60 @@
+import os
+
+import numpy
+
+
+class GridBackend:
+    """
+    Allocates the grids a GameMap keeps on top of the tcod Map arrays
+
+    Args:
+        directory: if given, grids are numpy.memmap files in this directory instead of in-memory arrays,
+            one directory per map since the files are named after the grids
+        compact: size label and region grids to the smallest dtype that fits instead of numpy.int
+
+    The walkable, transparent and fov grids belong to tcod.map.Map and always stay in memory.
+    """
+
+    def __init__(self, directory: str = None, compact: bool = True):
+        self.directory = directory
+        self.compact = compact
+
+    @property
+    def label_dtype(self) -> numpy.dtype:
+        # TileType values that end up in label_grid run from EMPTY (-1) to DOOR_OPEN (4)
+        return numpy.dtype(numpy.int8 if self.compact else numpy.int_)
+
+    def region_dtype(self, max_regions: int) -> numpy.dtype:
+        """
+        :param max_regions: highest number of regions the grid has to hold, -1 is used for no region
+        :type max_regions: int
+        :return: smallest signed integer dtype that holds every region
+        :rtype: numpy.dtype
+        """
+        if not self.compact:
+            return numpy.dtype(numpy.int_)
+        for dtype in (numpy.int16, numpy.int32):
+            if max_regions <= numpy.iinfo(dtype).max:
+                return numpy.dtype(dtype)
+        return numpy.dtype(numpy.int64)
+
+    def allocate(self, name: str, shape: tuple, dtype, fill) -> numpy.ndarray:
+        """
+        :param name: name of the grid, used as the file name when memory-mapping
+        :type name: str
+        :param shape: (width, height) of the map
+        :type shape: tuple
+        :return: a Fortran ordered grid, indexed [x, y] like the tcod arrays, filled with fill
+        :rtype: numpy.ndarray
+        """
+        if self.directory is None:
+            return numpy.full(shape, fill, dtype=dtype, order="F")
+
+        os.makedirs(self.directory, exist_ok=True)
+        grid = numpy.memmap(
+            os.path.join(self.directory, f"{name}.grid"), dtype=dtype, mode="w+", shape=shape, order="F"
+        )
+        # new memmap files start zeroed
+        if fill:
+            grid[...] = fill
+        return grid
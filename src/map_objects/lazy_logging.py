@@ -0,0 +1,20 @@
+import functools
+
+
+def catch(function):
+    """
+    decorator that logs and swallows any Exception raised by function, like loguru's logger.catch(), but only
+    imports loguru once an exception is caught so importing the decorated module doesn't pay for it
+    """
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        try:
+            return function(*args, **kwargs)
+        except Exception:
+            from loguru import logger
+
+            logger.opt(exception=True).error(f"An error has been caught in function '{function.__qualname__}'")
+            return None
+
+    return wrapper
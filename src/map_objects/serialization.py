@@ -0,0 +1,210 @@
+"""
+On-disk format for built dungeons
+
+A dungeon is stored as two files sharing a base path:
+    <path>.grids: the raw bytes of every grid, Fortran ordered like GameMap, each starting on a 64 byte boundary
+    <path>.json: format version, map settings, the offset, dtype and shape of each grid, rooms and entities
+
+Loading memory-maps the grids file, so the cost of opening a level is reading the JSON and copying the two
+grids tcod owns (walkable and transparent).
+
+Both files are written under temporary names and moved into place, the JSON last, so a dungeon is only ever seen
+complete: an interrupted save leaves at most a grids file without its JSON, which DungeonCache.evict removes.
+"""
+import hashlib
+import json
+import os
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from entity import Entity, EntityIndex
+from map_objects.dungeon import Dungeon, Room
+from map_objects.point import Point
+
+FORMAT_VERSION = 1
+
+GRID_NAMES = ("label_grid", "region_grid", "explored_grid", "walkable", "transparent")
+# grids owned by tcod.map.Map have to be copied into place instead of being replaced
+TCOD_GRIDS = ("walkable", "transparent")
+TEMPORARY_EXTENSION = ".tmp"
+
+ALIGNMENT = 64
+
+
+def settings_hash(map_settings: dict) -> str:
+    return hashlib.sha1(json.dumps(dict(map_settings), sort_keys=True).encode()).hexdigest()
+
+
+def save_dungeon(dungeon: Dungeon, path: str):
+    """
+    writes a built dungeon to <path>.grids and <path>.json, each replaced in one step once it is complete
+    :param dungeon: dungeon to save, entities are included if they were placed
+    :type dungeon: Dungeon
+    :param path: base path for the two files
+    :type path: str
+    """
+    game_map = dungeon.game_map
+    layout: Dict[str, Dict] = {}
+    offset = 0
+    grids_path = f"{path}.grids.{os.getpid()}{TEMPORARY_EXTENSION}"
+    with open(grids_path, "wb") as f:
+        for name in GRID_NAMES:
+            grid = getattr(game_map, name)
+            offset = -(-offset // ALIGNMENT) * ALIGNMENT
+            f.seek(offset)
+            f.write(grid.tobytes(order="F"))
+            layout[name] = dict(offset=offset, dtype=grid.dtype.str, shape=list(grid.shape))
+            offset += grid.nbytes
+
+    entities: List[Dict] = []
+    for entity in dungeon.entities or []:
+        entities.append(
+            dict(
+                name=entity.name,
+                x=entity.x,
+                y=entity.y,
+                char=entity.char,
+                color=entity.color,
+                blocks=entity.blocks,
+                speed=entity.speed,
+            )
+        )
+
+    metadata = dict(
+        version=FORMAT_VERSION,
+        map_settings=dict(dungeon.map_settings),
+        current_region=dungeon.current_region,
+        grids=layout,
+        rooms=[[room.x, room.y, room.width, room.height, room.region] for room in dungeon.rooms],
+        entities=entities,
+    )
+    json_path = f"{path}.json.{os.getpid()}{TEMPORARY_EXTENSION}"
+    with open(json_path, "w") as f:
+        json.dump(metadata, f)
+
+    os.replace(grids_path, f"{path}.grids")
+    os.replace(json_path, f"{path}.json")
+
+
+def load_dungeon(path: str, mmap_mode: str = "c") -> Dungeon:
+    """
+    reads a dungeon written by save_dungeon
+    :param path: base path for the two files
+    :type path: str
+    :param mmap_mode: numpy.memmap mode for the grids, the default "c" keeps changes in memory only
+    :type mmap_mode: str
+    :return: the dungeon, with entities and entity_index set if they were saved
+    :rtype: Dungeon
+    """
+    with open(f"{path}.json") as f:
+        metadata = json.load(f)
+    if metadata["version"] != FORMAT_VERSION:
+        raise ValueError(f"{path}.json has format version {metadata['version']}, expected {FORMAT_VERSION}")
+
+    dungeon = Dungeon(metadata["map_settings"])
+    game_map = dungeon.game_map
+    for name, layout in metadata["grids"].items():
+        grid = np.memmap(
+            f"{path}.grids",
+            dtype=np.dtype(layout["dtype"]),
+            mode=mmap_mode,
+            offset=layout["offset"],
+            shape=tuple(layout["shape"]),
+            order="F",
+        )
+        if name in TCOD_GRIDS:
+            getattr(game_map, name)[...] = grid
+        else:
+            setattr(game_map, name, grid)
+
+    for x, y, width, height, region in metadata["rooms"]:
+        room = Room(x, y, width, height)
+        room.region = region
+        dungeon.rooms.append(room)
+    dungeon.current_region = metadata["current_region"]
+
+    if metadata["entities"]:
+        dungeon.entity_index = EntityIndex(
+            game_map.width,
+            game_map.height,
+            [
+                Entity(
+                    e["name"],
+                    Point(e["x"], e["y"]),
+                    char=e["char"],
+                    color=e["color"],
+                    blocks=e["blocks"],
+                    speed=e.get("speed", 100),
+                )
+                for e in metadata["entities"]
+            ],
+        )
+        dungeon.entities = dungeon.entity_index.entities
+
+    return dungeon
+
+
+class DungeonCache:
+    """
+    A directory of saved dungeons keyed by (seed, map settings), bounded in size
+
+    Args:
+        directory to keep the saved dungeons in
+        max_bytes the entries may take up before the least recently used are evicted
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def path(self, seed, map_settings: dict) -> str:
+        key = hashlib.sha1(f"{seed!r}:{settings_hash(map_settings)}:{FORMAT_VERSION}".encode()).hexdigest()
+        return os.path.join(self.directory, key)
+
+    def load(self, seed, map_settings: dict) -> Optional[Dungeon]:
+        """
+        :return: the cached dungeon for seed and map_settings, or None if there is none
+        :rtype: Dungeon
+        """
+        path = self.path(seed, map_settings)
+        if not (os.path.exists(f"{path}.json") and os.path.exists(f"{path}.grids")):
+            return None
+
+        # mark the entry as recently used
+        os.utime(f"{path}.json")
+        return load_dungeon(path)
+
+    def store(self, seed, map_settings: dict, dungeon: Dungeon):
+        os.makedirs(self.directory, exist_ok=True)
+        save_dungeon(dungeon, self.path(seed, map_settings))
+        self.evict()
+
+    def evict(self):
+        """
+        removes the least recently used entries until the cache fits in max_bytes, always keeping the newest one,
+        and the files interrupted saves left behind: temporary files and grids without their JSON
+        """
+        entries = []
+        names = set(os.listdir(self.directory))
+        for name in names:
+            base, ext = os.path.splitext(name)
+            if ext == TEMPORARY_EXTENSION or (ext == ".grids" and f"{base}.json" not in names):
+                os.remove(os.path.join(self.directory, name))
+            if ext != ".json":
+                continue
+            path = os.path.join(self.directory, base)
+            size = os.path.getsize(f"{path}.json")
+            if os.path.exists(f"{path}.grids"):
+                size += os.path.getsize(f"{path}.grids")
+            entries.append((os.path.getmtime(f"{path}.json"), size, path))
+
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries[:-1]:
+            if total <= self.max_bytes:
+                break
+            for ext in (".json", ".grids"):
+                if os.path.exists(f"{path}{ext}"):
+                    os.remove(f"{path}{ext}")
+            total -= size
@@ -2,6 +2,8 @@ from dataclasses import dataclass
 from enum import Enum
 from typing import Dict
 
+import numpy
+
 import const
 from map_objects.point import Point
 
@@ -22,36 +24,76 @@ class TileType(Enum):
         return str(self.name)
 
 
-@dataclass()
+@dataclass(frozen=True)
+class TileKind:
+    """
+    The properties shared by every tile of one TileType, there is a single instance per TileType in TILE_KINDS
+
+    Attributes:
+        label: TileType of the tile
+        char: glyph drawn for the tile
+        walkable: if the tile can be walked through
+        transparent: if the tile can be seen through
+    """
+    label: TileType
+    char: str
+    walkable: bool
+    transparent: bool
+
+
+TILE_KINDS: Dict[TileType, TileKind] = {
+    TileType.EMPTY: TileKind(TileType.EMPTY, const.Tiles.UNSEEN, walkable=False, transparent=False),
+    TileType.WALL: TileKind(TileType.WALL, const.Tiles.WALL, walkable=False, transparent=False),
+    TileType.FLOOR: TileKind(TileType.FLOOR, const.Tiles.FLOOR, walkable=True, transparent=True),
+    TileType.CORRIDOR: TileKind(TileType.CORRIDOR, const.Tiles.CORRIDOR, walkable=True, transparent=True),
+    TileType.DOOR_CLOSED: TileKind(TileType.DOOR_CLOSED, const.Tiles.DOOR_CLOSED, walkable=False, transparent=False),
+    TileType.DOOR_OPEN: TileKind(TileType.DOOR_OPEN, const.Tiles.DOOR_OPEN, walkable=True, transparent=True),
+    TileType.ERROR: TileKind(TileType.ERROR, const.Tiles.UNSEEN, walkable=False, transparent=False),
+}
+KINDS_BY_VALUE: Dict[int, TileKind] = {label.value: kind for label, kind in TILE_KINDS.items()}
+
+# lookup tables for the labels stored in GameMap.label_grid, index them with label_grid - TileType.EMPTY.value
+GRID_LABELS = [TileType.EMPTY, TileType.WALL, TileType.FLOOR, TileType.CORRIDOR, TileType.DOOR_CLOSED,
+               TileType.DOOR_OPEN]
+WALKABLE_TABLE = numpy.array([TILE_KINDS[label].walkable for label in GRID_LABELS], dtype=bool)
+TRANSPARENT_TABLE = numpy.array([TILE_KINDS[label].transparent for label in GRID_LABELS], dtype=bool)
+GLYPH_TABLE = numpy.array([ord(TILE_KINDS[label].char) for label in GRID_LABELS], dtype=numpy.uint32)
+
+
 class Tile:
     """
-    An object to represent a single tile in the map's grid
+    A view of a single tile in the map's grid, the properties shared by its TileType come from a TileKind
 
     Args:
         x- and y-coordinate for the tile
         label for the tile
-        passable or not
+        walkable and transparent, default to those of the label's TileKind
 
     Attributes:
         position: the Point in the grid
-        label: label of the tile
-        blocked:
-        blocks_sight:
-        passable: if the tile is passable
+        kind: shared TileKind for the label
+        walkable: if the tile can be walked through
+        transparent: if the tile can be seen through
+        explored: if the tile has been seen
+        visible: if the tile is in the field of view
     """
 
-    def __init__(self, x: int, y: int, *, label: TileType = None, walkable: bool = False,
-                 transparent: bool = False, char: str = None):
+    __slots__ = ("position", "kind", "walkable", "transparent", "explored", "visible")
+
+    def __init__(self, x: int, y: int, *, label: TileType = None, walkable: bool = None,
+                 transparent: bool = None):
         if label is None:
             label = TileType.EMPTY
-        if char is None:
-            char = const.Tiles.UNSEEN
+        kind = TILE_KINDS[label]
+        if walkable is None:
+            walkable = kind.walkable
+        if transparent is None:
+            transparent = kind.transparent
 
         self.position: Point = Point(x, y)
-        self.label: TileType = label
+        self.kind: TileKind = kind
         self.walkable: bool = walkable
         self.transparent: bool = transparent
-        self.char: str = char
         self.explored: bool = False
         self.visible: bool = False
 
@@ -69,6 +111,14 @@ class Tile:
     def y(self) -> int:
         return self.position.y
 
+    @property
+    def label(self) -> TileType:
+        return self.kind.label
+
+    @property
+    def char(self) -> str:
+        return self.kind.char
+
     @staticmethod
     def from_label(point: Point, label: TileType):
         """
@@ -80,21 +130,11 @@ class Tile:
         :return: returns a tile at x and y of point with the label provided
         :rtype: Tile
         """
-        labels = {
-            TileType.EMPTY: Tile.empty(point),
-            TileType.FLOOR: Tile.floor(point),
-            TileType.WALL: Tile.wall(point),
-            TileType.CORRIDOR: Tile.corridor(point),
-            TileType.DOOR_CLOSED: Tile.door(point, opened=False),
-            TileType.DOOR_OPEN: Tile.door(point, opened=True)
-        }
-
-        tile = labels.get(label, Tile.error(point))
-
-        if tile.label == TileType.ERROR:
+        if label not in TILE_KINDS or label == TileType.ERROR:
             print(f"Tile.from_label returned Tile.error. point={point}, label={label}")
+            return Tile.error(point)
 
-        return tile
+        return Tile(point.x, point.y, label=label)
 
     @classmethod
     def empty(cls, point=Point(-1, -1)):
@@ -116,7 +156,7 @@ class Tile:
         :return: returns a tile at x and y of point with the label "FLOOR" and passable
         :rtype: Tile
         """
-        return Tile(point.x, point.y, label=TileType.FLOOR, walkable=True, transparent=True, char=const.Tiles.FLOOR)
+        return Tile(point.x, point.y, label=TileType.FLOOR)
 
     @classmethod
     def corridor(cls, point):
@@ -127,8 +167,7 @@ class Tile:
         :return: returns a tile at x and y of point with the label "CORRIDOR" and passable
         :rtype: Tile
         """
-        return Tile(point.x, point.y, label=TileType.CORRIDOR, walkable=True, transparent=True,
-                    char=const.Tiles.CORRIDOR)
+        return Tile(point.x, point.y, label=TileType.CORRIDOR)
 
     @classmethod
     def wall(cls, point):
@@ -139,7 +178,7 @@ class Tile:
         :return: returns a tile at x and y of point with the label "WALL" and not passable
         :rtype: Tile
         """
-        return Tile(point.x, point.y, label=TileType.WALL, walkable=False, transparent=False, char=const.Tiles.WALL)
+        return Tile(point.x, point.y, label=TileType.WALL)
 
     @classmethod
     def door(cls, point, opened=False):
@@ -153,11 +192,9 @@ class Tile:
         :rtype Tile
         """
         if opened:
-            return Tile(point.x, point.y, label=TileType.DOOR_OPEN, walkable=True, transparent=True,
-                        char=const.Tiles.DOOR_OPEN)
+            return Tile(point.x, point.y, label=TileType.DOOR_OPEN)
         else:
-            return Tile(point.x, point.y, label=TileType.DOOR_CLOSED, walkable=False, transparent=False,
-                        char=const.Tiles.DOOR_CLOSED)
+            return Tile(point.x, point.y, label=TileType.DOOR_CLOSED)
 
     @classmethod
     def error(cls, point):
@@ -172,10 +209,13 @@ class Tile:
         #     walkable=grids.get("walkable", True),
         #     transparent=grids.get("transparent", True),
         # )
-        label = TileType(grids["label"])
-        tile = Tile.from_label(point, label)
-        tile.walkable = grids.get("walkable", False)
-        tile.transparent = grids.get("transparent", False)
+        tile = Tile(
+            point.x,
+            point.y,
+            label=KINDS_BY_VALUE[grids["label"]].label,
+            walkable=grids.get("walkable", False),
+            transparent=grids.get("transparent", False),
+        )
         tile.explored = grids.get("explored", False)
         tile.visible = grids.get("visible", False)
 
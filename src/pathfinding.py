@@ -0,0 +1,271 @@
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy
+import tcod.path
+
+from entity import EntityIndex
+from map_objects import GameMap, Point
+
+Cell = Tuple[int, int]
+# start x, start y, goal x, goal y
+PathKey = Tuple[int, int, int, int]
+
+
+class CachedPath:
+    """
+    A path still to be walked, the steps before offset were already taken
+
+    Attributes:
+        key: (start, goal) it is cached under, start moves along as steps are taken
+        steps: cells from the first step to the goal, as computed
+        offset: index of the next step to take
+        at: cell -> index in steps, to tell if a changed cell is still ahead
+        detour: cells appended to the end since it was searched, for following a goal that moved, each can make
+            it a step longer than the shortest path
+    """
+
+    __slots__ = ("key", "steps", "offset", "at", "detour")
+
+    def __init__(self, key: PathKey, steps: List[Cell], detour: int = 0):
+        self.key: PathKey = key
+        self.steps: List[Cell] = steps
+        self.offset: int = 0
+        self.at: Dict[Cell, int] = {cell: i for i, cell in enumerate(steps)}
+        self.detour: int = detour
+
+    def __len__(self):
+        return len(self.steps) - self.offset
+
+    def remaining(self) -> List[Cell]:
+        return self.steps[self.offset:]
+
+    def ahead(self, cell: Cell) -> bool:
+        return self.at.get(cell, -1) >= self.offset
+
+
+class Pathfinder:
+    """
+    A* paths over GameMap.walkable, with the cells blocking entities stand on costing more, cached per (start, goal)
+
+    The cost grid and the cache are kept up to date by listening to game_map.change_listeners and
+    entity_index.occupancy_listeners. A cached path is only dropped when a cell still ahead on it changes.
+
+    A path whose goal moved by one step, like a monster's path to a player who just moved, is followed instead of
+    searched again: the goal's new cell is appended to it, or it is cut short if the goal stepped back onto it. After
+    max_detour cells were appended it is searched again, so it is never more than max_detour steps too long.
+
+    Args:
+        game_map to find paths on
+        entity_index whose blocking entities make cells more expensive to walk through
+        occupied_cost: cost of stepping onto a cell a blocking entity is on, other walkable cells cost 1
+        diagonal: cost of a diagonal step, 0 for no diagonal steps
+        max_paths: number of paths cached before the least recently used are dropped
+        max_detour: cells appended to a path to follow its goal before it is searched again
+
+    Attributes:
+        cost: cost of stepping onto each cell, 0 where it isn't walkable, indexed [x, y]
+        paths: key -> CachedPath, in least to most recently used order
+        starts: start cell -> the cached path from it used last, to find the path to follow when the goal moved
+        cell_paths: cell -> cached paths computed through it, including ones already past it
+        deadline: time.perf_counter() after which no new paths are computed this turn, None for no limit
+        computed, reused, followed and over_budget: number of paths searched, served from the cache as they were,
+            served from a cached path to the goal's previous cell, and refused
+    """
+
+    def __init__(
+        self,
+        game_map: GameMap,
+        entity_index: EntityIndex,
+        occupied_cost: int = 10,
+        diagonal: float = 1.41,
+        max_paths: int = 4096,
+        max_detour: int = 8,
+    ):
+        self.game_map: GameMap = game_map
+        self.entity_index: EntityIndex = entity_index
+        self.occupied_cost: int = occupied_cost
+        self.max_paths: int = max_paths
+        self.max_detour: int = max_detour
+        self.diagonal: float = diagonal
+
+        self.cost = numpy.zeros(game_map.walkable.shape, dtype=numpy.int32, order="F")
+        self.update_cost(0, 0, game_map.width, game_map.height)
+        # AStar reads the cost grid in place, so updating it is enough for later searches
+        self.astar = tcod.path.AStar(self.cost, diagonal)
+
+        self.paths: OrderedDict = OrderedDict()
+        self.starts: Dict[Cell, CachedPath] = {}
+        self.cell_paths: Dict[Cell, Set[CachedPath]] = {}
+        self.deadline: Optional[float] = None
+        self.computed: int = 0
+        self.reused: int = 0
+        self.followed: int = 0
+        self.over_budget: int = 0
+
+        game_map.change_listeners.append(self.map_changed)
+        entity_index.occupancy_listeners.append(self.occupancy_changed)
+
+    def detach(self):
+        """
+        stops listening to the map and the entity index
+        """
+        self.game_map.change_listeners.remove(self.map_changed)
+        self.entity_index.occupancy_listeners.remove(self.occupancy_changed)
+
+    def start_turn(self, budget: float = None):
+        """
+        :param budget: seconds from now after which path() and peek_step() stop searching for new paths this
+            turn and only serve cached ones, None for no limit
+        """
+        self.deadline = None if budget is None else time.perf_counter() + budget
+
+    def update_cost(self, x: int, y: int, width: int, height: int):
+        area = (slice(x, x + width), slice(y, y + height))
+        walkable = self.game_map.walkable[area]
+        occupied = self.entity_index.occupancy[area] > 0
+        self.cost[area] = numpy.where(walkable, numpy.where(occupied, self.occupied_cost, 1), 0)
+
+    def map_changed(self, x: int, y: int, width: int, height: int):
+        self.update_cost(x, y, width, height)
+        for cell_x in range(x, x + width):
+            for cell_y in range(y, y + height):
+                self.invalidate((cell_x, cell_y))
+
+    def occupancy_changed(self, point: Point):
+        self.update_cost(point.x, point.y, 1, 1)
+        self.invalidate((point.x, point.y))
+
+    def invalidate(self, cell: Cell):
+        """
+        drops the cached paths that still have cell ahead of them, other than as their goal: every way to the goal
+        pays for its cell, so the goal moving off it doesn't change which way is shortest
+        """
+        for path in list(self.cell_paths.get(cell, ())):
+            if path.ahead(cell) and cell != path.steps[-1]:
+                self._drop(path)
+
+    def path(self, start: Point, goal: Point) -> Optional[List[Cell]]:
+        """
+        :return: cells from the first step after start to goal, empty if goal can't be reached, or None if the
+            path isn't cached and the turn's budget is spent
+        :rtype: List[Tuple[int, int]]
+        """
+        cached = self._find(start, goal)
+        if cached is None:
+            return None
+        return cached.remaining()
+
+    def peek_step(self, start: Point, goal: Point) -> Optional[Point]:
+        """
+        :return: the first step of the path from start to goal, without taking it, or None if there is no path or
+            no budget left to find one
+        :rtype: Point
+        """
+        cached = self._find(start, goal)
+        if not cached:
+            return None
+        return Point(*cached.steps[cached.offset])
+
+    def take_step(self, start: Point, goal: Point):
+        """
+        moves the cached path from start to goal past the step peek_step() gave, the rest stays cached under
+        (step, goal); call it once the step is sure to be taken and before the move, which would drop the path
+        as a change on a cell ahead of it otherwise
+        """
+        cached = self.paths.get((start.x, start.y, goal.x, goal.y))
+        if not cached:
+            return
+
+        step = cached.steps[cached.offset]
+        self._unkey(cached)
+        cached.offset += 1
+        if cached:
+            self._key(cached, (step[0], step[1], goal.x, goal.y))
+        else:
+            self._forget(cached)
+
+    def _find(self, start: Point, goal: Point) -> Optional[CachedPath]:
+        key = (start.x, start.y, goal.x, goal.y)
+        cached = self.paths.get(key)
+        if cached is not None:
+            self.paths.move_to_end(key)
+            self.reused += 1
+            return cached
+
+        cached = self._follow(start, goal)
+        if cached is not None:
+            self.followed += 1
+            return cached
+
+        if self.deadline is not None and time.perf_counter() > self.deadline:
+            self.over_budget += 1
+            return None
+
+        self.computed += 1
+        cached = CachedPath(key, self.astar.get_path(*key))
+        # unreachable goals aren't cached, no change along an empty path would ever drop them
+        if cached:
+            self._register(cached)
+        return cached
+
+    def _follow(self, start: Point, goal: Point) -> Optional[CachedPath]:
+        """
+        :return: the path last used from start, changed to end at goal if its goal was a step away from it, or None
+        """
+        previous = self.starts.get((start.x, start.y))
+        if previous is None:
+            return None
+        end_x, end_y = previous.key[2:]
+        dx, dy = abs(goal.x - end_x), abs(goal.y - end_y)
+        if max(dx, dy) > 1 or (not self.diagonal and dx and dy):
+            return None
+
+        cell = (goal.x, goal.y)
+        steps, detour = previous.remaining(), previous.detour
+        if previous.ahead(cell):
+            steps = steps[:previous.at[cell] - previous.offset + 1]
+        elif self.cost[cell] > 0 and detour < self.max_detour:
+            steps.append(cell)
+            detour += 1
+        else:
+            return None
+
+        self._drop(previous)
+        followed = CachedPath((start.x, start.y, goal.x, goal.y), steps, detour)
+        self._register(followed)
+        return followed
+
+    def _register(self, path: CachedPath):
+        self._key(path, path.key)
+        for cell in path.steps:
+            self.cell_paths.setdefault(cell, set()).add(path)
+        while len(self.paths) > self.max_paths:
+            self._drop(next(iter(self.paths.values())))
+
+    def _key(self, path: CachedPath, key: PathKey):
+        existing = self.paths.get(key)
+        if existing is not None and existing is not path:
+            self._drop(existing)
+        path.key = key
+        self.paths[key] = path
+        self.starts[key[:2]] = path
+
+    def _unkey(self, path: CachedPath):
+        if self.paths.get(path.key) is path:
+            del self.paths[path.key]
+        if self.starts.get(path.key[:2]) is path:
+            del self.starts[path.key[:2]]
+
+    def _drop(self, path: CachedPath):
+        self._unkey(path)
+        self._forget(path)
+
+    def _forget(self, path: CachedPath):
+        for cell in path.steps:
+            paths = self.cell_paths.get(cell)
+            if paths is not None:
+                paths.discard(path)
+                if not paths:
+                    del self.cell_paths[cell]
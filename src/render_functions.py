@@ -1,106 +1,154 @@
-import tcod
-from bearlibterminal import terminal
+import numpy
+from terminal_backend import terminal
+from typing import Tuple
 
 from camera import Camera
 from const import Layers, Tiles
 from entity import Entity
-from map_objects import Tile, Point, GameMap
+from frame_timer import FrameTimer
+from map_objects import Tile, Point, GameMap, TileType
+from map_objects.tile import GLYPH_TABLE
 from rect import Rect
 
 
-def render_all(entities, game_map: GameMap, fov_update: bool, camera: Camera):
+class MapRenderer:
+    """
+    Keeps the last frame drawn to the map layer and only redraws the cells that changed since
+
+    Args:
+        width and height of the area drawn, in cells
+
+    Attributes:
+        glyphs: codepoint drawn in each cell of the last frame, indexed [x, y]
+        states: visibility state of each cell of the last frame, one of UNSEEN, REMEMBERED or VISIBLE
+        colors: lookup table of the color for each visibility state, resolved once
+        valid: False until a full frame has been drawn, or after invalidate()
+    """
+
+    UNSEEN = 0
+    REMEMBERED = 1
+    VISIBLE = 2
+
+    def __init__(self, width: int, height: int):
+        self.width: int = width
+        self.height: int = height
+        self.glyphs = numpy.zeros((width, height), dtype=numpy.uint32)
+        self.states = numpy.zeros((width, height), dtype=numpy.uint8)
+        self.colors = numpy.array(
+            [
+                terminal.color_from_name("black"),
+                terminal.color_from_name("grey"),
+                terminal.color_from_name("white"),
+            ],
+            dtype=numpy.uint32,
+        )
+        self.valid: bool = False
+
+    def invalidate(self):
+        """
+        makes the next draw() redraw every cell, e.g. after the layer was cleared
+        """
+        self.valid = False
+
+    def compose(self, game_map: GameMap, camera: Camera) -> Tuple[numpy.ndarray, numpy.ndarray]:
+        """
+        builds the frame for the camera's view of the map from slices of label_grid, fov and explored_grid
+        :return: glyph and visibility state of every cell in the camera's view
+        :rtype: Tuple[numpy.ndarray, numpy.ndarray]
+        """
+        world, screen = camera.map_window(game_map.width, game_map.height)
+        visible = game_map.fov[world]
+        explored = game_map.explored_grid[world]
+
+        glyphs = numpy.full_like(self.glyphs, ord(Tiles.UNSEEN))
+        states = numpy.full_like(self.states, self.UNSEEN)
+
+        labels = game_map.label_grid[world].astype(numpy.intp) - TileType.EMPTY.value
+        glyphs[screen] = numpy.where(explored, GLYPH_TABLE[labels], ord(Tiles.UNSEEN))
+        states[screen] = numpy.where(visible, self.VISIBLE, numpy.where(explored, self.REMEMBERED, self.UNSEEN))
+        return glyphs, states
+
+    def draw(self, glyphs: numpy.ndarray, states: numpy.ndarray) -> int:
+        """
+        puts the cells whose glyph or visibility state differ from the last frame
+        :return: number of cells put
+        :rtype: int
+        """
+        if self.valid:
+            changed = (glyphs != self.glyphs) | (states != self.states)
+        else:
+            changed = numpy.ones(glyphs.shape, dtype=bool)
+        xs, ys = numpy.nonzero(changed)
 
-    camera_view = camera.view
-
-    if fov_update:
-        terminal.clear()
         terminal.layer(Layers.MAP)
+        # with composition on, put would stack the new tile on top of the old one instead of replacing it
+        terminal.composition(False)
+        colors = self.colors[states[xs, ys]]
+        last_color = None
+        for x, y, glyph, color in zip(xs.tolist(), ys.tolist(), glyphs[xs, ys].tolist(), colors.tolist()):
+            if color != last_color:
+                terminal.color(color)
+                last_color = color
+            terminal.put(x, y, glyph)
+        terminal.composition(True)
+
+        self.glyphs[...] = glyphs
+        self.states[...] = states
+        self.valid = True
+        return len(xs)
 
-        for x, y, point in camera:
-            tile = game_map.tile(point)
-
-            # tile will be displayed
-            if tile.visible:
-                # tile is currently visible
-                color = terminal.color_from_name("white")
-                game_map.explore(point)
-            else:
-                # tile is not
-                color = terminal.color_from_name("grey")
-
-            if tile.explored:
-                char = tile.char
-            else:
-                # print(f"{tile.position} is not explored")
-                color = terminal.color_from_name("black")
-                char = Tiles.UNSEEN
-
-            terminal.color(color)
-            terminal.put(x, y, char)
-        #
-        # for ty in range(camera.height):
-        #     for tx in range(camera.width):
-        #         point = Point(tx + camera.x, ty + camera.y)
-        #         tile = game_map.tile(point)
-        #         # color = terminal.color_from_name(tile.color)
-        #         color = terminal.color_from_name("white")
-        #         terminal.color(color)
-        #         terminal.put(tx, ty, tile.char)
-
-
-                # if not game_map.in_bounds(point) or not game_map.explored(point):
-                #     color = "black"
-                #     char = Tiles.UNSEEN
-                # else:
-                #     if game_map.in_fov(point):
-                #         color = "white"
-                #     else:
-                #         color = "grey"
-                #     char = game_map.tile(point).char
-                # terminal.color(terminal.color_from_name(color))
-                # terminal.put(tx, ty, char)
-            # terminal.printf(0, ty, row)
-        #
-        # for point in camera:
-        #     if not game_map.in_bounds(point):
-        #         continue
-        #     visible = game_map.fov[point.x, point.y]
-        #     if visible:
-        #         color = terminal.color_from_name("white")
-        #         terminal.color(color)
-        #         game_map.explore(point)
-        #     else:
-        #         color = terminal.color_from_name("grey")
-        #         terminal.color(color)
-        #     if game_map.explored(point):
-        #         tile = game_map.tile(point)
-        #         terminal.put(point.x, point.y, tile.char)
+
+def render_all(entities, game_map: GameMap, fov_update: bool, camera: Camera, renderer: MapRenderer):
+
+    if fov_update:
+        renderer.draw(*renderer.compose(game_map, camera))
 
     for entity in entities:
-        draw_entity(entity, game_map, camera_view)
+        draw_entity(entity, game_map, camera)
 
 
-def draw_entity(entity: Entity, game_map: GameMap, camera_view: dict):
-    if game_map.in_fov(entity.position):
+def draw_entity(entity: Entity, game_map: GameMap, camera: Camera):
+    view = camera.world_to_screen(entity.position)
+    if view is not None and game_map.in_fov(entity.position):
         # set layer to draw on
         terminal.layer(Layers.PLAYER)
         # change color
         color = terminal.color_from_name(entity.color)
         terminal.color(color)
-        view_x, view_y = camera_view[entity.position]
-        terminal.put(view_x, view_y, entity.char)
+        terminal.put(view.x, view.y, entity.char)
 
 
-def clear_entity(entity):
+def clear_entity(entity, camera: Camera):
+    view = camera.world_to_screen(entity.position)
+    if view is None:
+        return
+    # the map layer is no longer cleared every frame, so clear the entity's cell on its own layer only
     terminal.layer(Layers.PLAYER)
-    color = terminal.color_from_name(entity.color)
-    terminal.color(color)
-    terminal.put(entity.x, entity.y, " ")
+    terminal.clear_area(view.x, view.y, 1, 1)
 
 
-def clear_all(entities):
+def clear_all(entities, camera: Camera):
     for entity in entities:
-        clear_entity(entity)
+        clear_entity(entity, camera)
+
+
+def draw_frame_stats(timer: FrameTimer, width: int):
+    """
+    writes the p50, p95 and max frame times over the recorded frames to the top row of the testing layer
+    """
+    stats = timer.frame_stats()
+    text = f"p50 {stats['p50']:.2f} p95 {stats['p95']:.2f} max {stats['max']:.2f}ms"
+
+    terminal.layer(Layers.TESTING)
+    terminal.clear_area(0, 0, width, 1)
+    terminal.color(terminal.color_from_name("yellow"))
+    for x, char in enumerate(text[:width]):
+        terminal.put(x, 0, char)
+
+
+def clear_frame_stats(width: int):
+    terminal.layer(Layers.TESTING)
+    terminal.clear_area(0, 0, width, 1)
 
 
 def draw_map(game_map):
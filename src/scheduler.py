@@ -0,0 +1,119 @@
+import heapq
+import itertools
+from typing import Dict, List, Optional, Set, Tuple
+
+from entity import Entity, EntityIndex
+from map_objects import Point
+
+# time an action takes for an entity of NORMAL_SPEED
+ACTION_COST = 100
+NORMAL_SPEED = 100
+
+
+class TurnScheduler:
+    """
+    Orders the actions of the awake entities by time with a heap, faster entities coming up more often
+
+    Only awake entities are scheduled, so a turn costs in proportion to them rather than to everything on the
+    level. update_sleep() wakes the entities that come near the player and puts the ones far away to sleep.
+
+    Attributes:
+        now: time of the action being taken
+        awake: entities currently scheduled
+        heap: (time, sequence, entity) of upcoming actions, entries whose sequence isn't the entity's current one
+            in `upcoming` are stale and skipped
+        upcoming: id of entity -> (time, sequence) of its next action
+    """
+
+    def __init__(self):
+        self.now: int = 0
+        self.awake: Set[Entity] = set()
+        self.heap: List[Tuple[int, int, Entity]] = []
+        self.upcoming: Dict[int, Tuple[int, int]] = {}
+        self.sequence = itertools.count()
+
+    def __len__(self):
+        return len(self.awake)
+
+    def __contains__(self, entity: Entity) -> bool:
+        return entity in self.awake
+
+    @staticmethod
+    def delay(entity: Entity) -> int:
+        """
+        :return: time until entity's next action after it acts
+        :rtype: int
+        """
+        return max(1, ACTION_COST * NORMAL_SPEED // entity.speed)
+
+    def schedule(self, entity: Entity, delay: int = None, start: int = None):
+        """
+        wakes entity if it is asleep and has it act delay after start, replacing its upcoming action
+        :param delay: defaults to the time an action takes at entity's speed
+        :param start: defaults to now, pass the time entity acted at to reschedule it after acting
+        """
+        if delay is None:
+            delay = self.delay(entity)
+        if start is None:
+            start = self.now
+        time, sequence = start + delay, next(self.sequence)
+        self.awake.add(entity)
+        self.upcoming[id(entity)] = (time, sequence)
+        heapq.heappush(self.heap, (time, sequence, entity))
+
+    def sleep(self, entity: Entity):
+        """
+        takes entity out of the schedule until it is scheduled again
+        """
+        self.awake.discard(entity)
+        self.upcoming.pop(id(entity), None)
+
+    def _discard_stale(self):
+        heap = self.heap
+        while heap and self.upcoming.get(id(heap[0][2])) != heap[0][:2]:
+            heapq.heappop(heap)
+
+    def pop(self) -> Optional[Entity]:
+        """
+        :return: the entity whose action is next, moving now to its time, or None if nothing is awake
+        :rtype: Entity
+        """
+        self._discard_stale()
+        if not self.heap:
+            return None
+        time, _, entity = heapq.heappop(self.heap)
+        del self.upcoming[id(entity)]
+        self.now = time
+        return entity
+
+    def due_before(self, entity: Entity) -> List[Tuple[int, Entity]]:
+        """
+        pops every entity whose next action comes before entity's, in the order they act, moving now along;
+        entity itself stays scheduled
+        :return: time and entity of each action, empty if entity is next
+        :rtype: List[Tuple[int, Entity]]
+        """
+        limit = self.upcoming[id(entity)]
+        due = []
+        self._discard_stale()
+        while self.heap and self.heap[0][:2] < limit:
+            time = self.heap[0][0]
+            due.append((time, self.pop()))
+            self._discard_stale()
+        return due
+
+    def update_sleep(self, entity_index: EntityIndex, center: Point, wake_radius: int, sleep_radius: int):
+        """
+        schedules the entities within wake_radius of center that are asleep, and puts the awake entities farther
+        than sleep_radius from it to sleep, looking only at entities near center and at awake ones
+        """
+        for entity in entity_index.near(center, wake_radius):
+            if entity not in self.awake:
+                self.schedule(entity)
+
+        for entity in [
+            entity
+            for entity in self.awake
+            if max(abs(entity.x - center.x), abs(entity.y - center.y)) > sleep_radius
+        ]:
+            self.sleep(entity)
@@ -0,0 +1,86 @@
+"""
+Reports where startup time goes: import time per top-level package, and cold start to the first frame
+
+Each measurement runs in a fresh interpreter. The first frame is drawn on the headless terminal backend with a
+new seed and an empty dungeon cache in a temporary directory each run, so it includes building a dungeon rather
+than loading one from the cache, and leaves nothing behind.
+
+usage:
+    python startup_report.py --runs 5
+"""
+import argparse
+import json
+import re
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+from typing import Dict, List
+
+IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+\d+ \| *(\S+)")
+
+FIRST_FRAME = """
+import time
+start = time.perf_counter()
+import io, json, contextlib, tempfile, uuid
+from terminal_backend import HeadlessBackend, use_backend
+backend = HeadlessBackend()
+use_backend(backend)
+import engine
+imported = time.perf_counter()
+with contextlib.redirect_stdout(io.StringIO()), tempfile.TemporaryDirectory() as cache_directory:
+    engine.main(random_seed=uuid.uuid4().hex, cache_directory=cache_directory)
+print(json.dumps(dict(imports=imported - start, first_frame=backend.frame_times[0] - start)))
+"""
+
+
+def import_times(module: str = "engine") -> Dict[str, float]:
+    """
+    :return: seconds spent importing the modules of each top-level package while importing module, not counting
+        what they import from other packages
+    :rtype: Dict[str, float]
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"], capture_output=True, text=True, check=True
+    )
+    totals: Dict[str, float] = defaultdict(float)
+    for line in result.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match:
+            self_time, name = match.groups()
+            totals[name.partition(".")[0]] += int(self_time) / 1e6
+    return dict(sorted(totals.items(), key=lambda item: -item[1]))
+
+
+def first_frame_times(runs: int) -> List[Dict[str, float]]:
+    """
+    :return: seconds from interpreter start of the script to the end of imports and to the first frame, per run
+    :rtype: List[Dict[str, float]]
+    """
+    times = []
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, "-c", FIRST_FRAME], capture_output=True, text=True, check=True)
+        times.append(json.loads(result.stdout.strip().splitlines()[-1]))
+    return times
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="number of cold starts to time")
+    parser.add_argument("--top", type=int, default=10, help="number of packages to list")
+    args = parser.parse_args(argv)
+
+    totals = import_times()
+    print(f"import engine: {sum(totals.values()) * 1000:.0f}ms over {len(totals)} top-level packages")
+    for name, seconds in list(totals.items())[:args.top]:
+        print(f"  {name:<24} {seconds * 1000:8.1f}ms")
+
+    times = first_frame_times(args.runs)
+    imports = statistics.median(t["imports"] for t in times)
+    first_frame = statistics.median(t["first_frame"] for t in times)
+    print(f"median of {args.runs} cold starts: imports {imports * 1000:.0f}ms, first frame {first_frame * 1000:.0f}ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
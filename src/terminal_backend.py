@@ -0,0 +1,305 @@
+"""
+Pluggable terminal backends
+
+Modules draw and read input through `terminal`, a proxy for the active backend, instead of importing
+bearlibterminal.terminal directly. BearLibBackend, the default, is only created on first use, so nothing loads
+BearLibTerminal when a HeadlessBackend is installed with use_backend() first.
+"""
+import time
+import zlib
+from abc import ABC, abstractmethod
+from collections import Counter, deque
+from typing import Dict, Iterable, List, Tuple, Union
+
+from const import SCREEN_HEIGHT, SCREEN_WIDTH
+
+
+class Keys:
+    """
+    Key codes used by the game, with the same values as BearLibTerminal's TK_ constants
+    """
+    TK_INPUT_NONE = 0x00
+    TK_B = 0x05
+    TK_H = 0x0B
+    TK_J = 0x0D
+    TK_K = 0x0E
+    TK_L = 0x0F
+    TK_N = 0x11
+    TK_P = 0x13
+    TK_R = 0x15
+    TK_U = 0x18
+    TK_Y = 0x1C
+    TK_ESCAPE = 0x29
+    TK_PERIOD = 0x37
+    TK_F1 = 0x3A
+    TK_RIGHT = 0x4F
+    TK_LEFT = 0x50
+    TK_DOWN = 0x51
+    TK_UP = 0x52
+    TK_KP_1 = 0x59
+    TK_KP_2 = 0x5A
+    TK_KP_3 = 0x5B
+    TK_KP_4 = 0x5C
+    TK_KP_6 = 0x5E
+    TK_KP_7 = 0x5F
+    TK_KP_8 = 0x60
+    TK_KP_9 = 0x61
+    TK_KP_0 = 0x62
+    TK_KP_PERIOD = 0x63
+    TK_CLOSE = 0xE0
+
+
+class TerminalBackend(Keys, ABC):
+    """
+    Interface for terminal backends, method names and arguments follow bearlibterminal.terminal
+    """
+
+    @abstractmethod
+    def open(self) -> bool:
+        ...
+
+    @abstractmethod
+    def close(self):
+        ...
+
+    @abstractmethod
+    def set(self, options: str) -> bool:
+        ...
+
+    @abstractmethod
+    def refresh(self):
+        ...
+
+    @abstractmethod
+    def clear(self):
+        ...
+
+    @abstractmethod
+    def clear_area(self, x: int, y: int, width: int, height: int):
+        ...
+
+    @abstractmethod
+    def layer(self, index: int):
+        ...
+
+    @abstractmethod
+    def color(self, color: int):
+        ...
+
+    @abstractmethod
+    def color_from_name(self, name: str) -> int:
+        ...
+
+    @abstractmethod
+    def composition(self, mode: bool):
+        ...
+
+    @abstractmethod
+    def put(self, x: int, y: int, code: Union[int, str]):
+        ...
+
+    @abstractmethod
+    def has_input(self) -> bool:
+        ...
+
+    @abstractmethod
+    def read(self) -> int:
+        ...
+
+
+class BearLibBackend(TerminalBackend):
+    """
+    Draws to a BearLibTerminal window
+    """
+
+    def __init__(self):
+        from bearlibterminal import terminal
+        self._terminal = terminal
+
+    def open(self) -> bool:
+        return self._terminal.open()
+
+    def close(self):
+        self._terminal.close()
+
+    def set(self, options: str) -> bool:
+        return self._terminal.set(options)
+
+    def refresh(self):
+        self._terminal.refresh()
+
+    def clear(self):
+        self._terminal.clear()
+
+    def clear_area(self, x: int, y: int, width: int, height: int):
+        self._terminal.clear_area(x, y, width, height)
+
+    def layer(self, index: int):
+        self._terminal.layer(index)
+
+    def color(self, color: int):
+        self._terminal.color(color)
+
+    def color_from_name(self, name: str) -> int:
+        return self._terminal.color_from_name(name)
+
+    def composition(self, mode: bool):
+        self._terminal.composition(mode)
+
+    def put(self, x: int, y: int, code: Union[int, str]):
+        self._terminal.put(x, y, code)
+
+    def has_input(self) -> bool:
+        return self._terminal.has_input()
+
+    def read(self) -> int:
+        return self._terminal.read()
+
+
+class HeadlessBackend(TerminalBackend):
+    """
+    Keeps the screen in memory and reads input from a script, for running the game loop without a display
+
+    Args:
+        width and height of the screen in cells
+        keys: scripted input, read() returns TK_CLOSE once it runs out so the game loop ends
+
+    Attributes:
+        cells: for each layer, the (code, color) stack drawn to each cell
+        calls: number of calls made to each method
+        frame_times: time.perf_counter() at every refresh()
+        options: every string passed to set()
+    """
+
+    NAMED_COLORS = {
+        "transparent": 0x00000000,
+        "black": 0xFF000000,
+        "white": 0xFFFFFFFF,
+        "grey": 0xFF808080,
+        "gray": 0xFF808080,
+        "red": 0xFFFF0000,
+        "green": 0xFF00FF00,
+        "blue": 0xFF0000FF,
+        "yellow": 0xFFFFFF00,
+    }
+
+    def __init__(self, width: int = SCREEN_WIDTH, height: int = SCREEN_HEIGHT, keys: Iterable[int] = ()):
+        self.width: int = width
+        self.height: int = height
+        self.cells: Dict[int, Dict[Tuple[int, int], List[Tuple[int, int]]]] = {}
+        self.calls: Counter = Counter()
+        self.frame_times: List[float] = []
+        self.options: List[str] = []
+        self.input = deque(keys)
+
+        self.is_open: bool = False
+        self.current_layer: int = 0
+        self.current_color: int = self.NAMED_COLORS["white"]
+        self.composition_mode: bool = False
+
+    def feed(self, *keys: int):
+        self.input.extend(keys)
+
+    def cell(self, x: int, y: int, layer: int = 0) -> Tuple[int, int]:
+        """
+        :return: code and color on top of the cell at x, y of layer, or (0, 0) if nothing was put there
+        :rtype: Tuple[int, int]
+        """
+        stack = self.cells.get(layer, {}).get((x, y))
+        return stack[-1] if stack else (0, 0)
+
+    def open(self) -> bool:
+        self.calls["open"] += 1
+        self.is_open = True
+        return True
+
+    def close(self):
+        self.calls["close"] += 1
+        self.is_open = False
+
+    def set(self, options: str) -> bool:
+        self.calls["set"] += 1
+        self.options.append(options)
+        return True
+
+    def refresh(self):
+        self.calls["refresh"] += 1
+        self.frame_times.append(time.perf_counter())
+
+    def clear(self):
+        self.calls["clear"] += 1
+        self.cells.clear()
+
+    def clear_area(self, x: int, y: int, width: int, height: int):
+        self.calls["clear_area"] += 1
+        layer = self.cells.get(self.current_layer, {})
+        for cell in [cell for cell in layer if x <= cell[0] < x + width and y <= cell[1] < y + height]:
+            del layer[cell]
+
+    def layer(self, index: int):
+        self.calls["layer"] += 1
+        self.current_layer = index
+
+    def color(self, color: int):
+        self.calls["color"] += 1
+        self.current_color = color
+
+    def color_from_name(self, name: str) -> int:
+        self.calls["color_from_name"] += 1
+        if name in self.NAMED_COLORS:
+            return self.NAMED_COLORS[name]
+        # any other name still gets a stable, opaque color
+        return zlib.crc32(name.encode()) | 0xFF000000
+
+    def composition(self, mode: bool):
+        self.calls["composition"] += 1
+        self.composition_mode = bool(mode)
+
+    def put(self, x: int, y: int, code: Union[int, str]):
+        self.calls["put"] += 1
+        if isinstance(code, str):
+            code = ord(code)
+        layer = self.cells.setdefault(self.current_layer, {})
+        if self.composition_mode and (x, y) in layer:
+            layer[(x, y)].append((code, self.current_color))
+        else:
+            layer[(x, y)] = [(code, self.current_color)]
+
+    def has_input(self) -> bool:
+        self.calls["has_input"] += 1
+        # an empty script still has the TK_CLOSE that ends the loop
+        return True
+
+    def read(self) -> int:
+        self.calls["read"] += 1
+        if self.input:
+            return self.input.popleft()
+        return self.TK_CLOSE
+
+
+class TerminalProxy:
+    """
+    Forwards every attribute to the active backend, creating a BearLibBackend on first use if none was set
+    """
+
+    def __init__(self):
+        self._backend: TerminalBackend = None
+
+    @property
+    def backend(self) -> TerminalBackend:
+        if self._backend is None:
+            self._backend = BearLibBackend()
+        return self._backend
+
+    def __getattr__(self, name: str):
+        return getattr(self.backend, name)
+
+
+terminal = TerminalProxy()
+
+
+def use_backend(backend: TerminalBackend):
+    """
+    makes every module that draws through `terminal` use backend from now on
+    """
+    terminal._backend = backend
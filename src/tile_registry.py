@@ -0,0 +1,220 @@
+"""
+Index of the sprites under tiles/, registered with the terminal only when first used
+
+Sprites are named by their path under the tiles directory without the extension, e.g. "mon/goblin" for
+tiles/mon/goblin.png. Each gets a codepoint counting up from TILE_FIRST_CODEPOINT, the ten sprites config.ini
+loads at startup stay below it. Sprites that aren't TILE_SIZE, like the 32x48 monsters or the title images, are
+loaded whole rather than cut into TILE_SIZE cells, which would spill onto the codepoints of the sprites after them.
+
+The index is kept in a JSON manifest so startup reads one file instead of walking the tree. The manifest only
+grows: a name missing from it triggers one rescan, which appends new sprites without moving existing codepoints.
+
+usage:
+    python tile_registry.py         rescans tiles/ and rewrites the manifest
+"""
+import json
+import os
+import struct
+import sys
+from typing import Dict, Iterable, List, Set, Tuple
+
+from const import TILE_FIRST_CODEPOINT, TILE_MANIFEST_PATH, TILE_SIZE, TILES_DIRECTORY
+from terminal_backend import terminal
+
+MANIFEST_VERSION = 2
+SPRITE_EXTENSIONS = (".png",)
+# path, codepoint, width and height of a sprite
+Entry = Tuple[str, int, int, int]
+
+
+def scan_tiles(root: str) -> List[str]:
+    """
+    :param root: tiles directory
+    :type root: str
+    :return: name of every sprite under root, sorted
+    :rtype: List[str]
+    """
+    names = []
+    for directory, subdirectories, files in os.walk(root):
+        subdirectories.sort()
+        relative = os.path.relpath(directory, root)
+        for file in files:
+            base, ext = os.path.splitext(file)
+            if ext.lower() in SPRITE_EXTENSIONS:
+                names.append(base if relative == "." else f"{relative}/{base}".replace(os.sep, "/"))
+    return sorted(names)
+
+
+def image_size(path: str) -> Tuple[int, int]:
+    """
+    reads the size from the header of a png instead of decoding it
+    :return: width and height in pixels
+    :rtype: Tuple[int, int]
+    """
+    with open(path, "rb") as f:
+        header = f.read(24)
+    if len(header) < 24 or header[:8] != b"\x89PNG\r\n\x1a\n":
+        raise ValueError(f"{path} is not a png")
+    return struct.unpack(">II", header[16:24])
+
+
+class TileRegistry:
+    """
+    Maps sprite names to codepoints, loading each sprite into the terminal the first time it is asked for
+
+    Args:
+        root: tiles directory
+        manifest_path: JSON file the index is cached in
+        first_codepoint: codepoint of the first sprite in the manifest
+        size: cell size, as "WxH", sprites of exactly this size are loaded at, others are loaded whole
+
+    Attributes:
+        entries: name -> (path, codepoint, width, height) of every sprite in the manifest
+        loaded: names registered with the terminal so far
+    """
+
+    def __init__(
+        self,
+        root: str = TILES_DIRECTORY,
+        manifest_path: str = TILE_MANIFEST_PATH,
+        first_codepoint: int = TILE_FIRST_CODEPOINT,
+        size: str = TILE_SIZE,
+    ):
+        self.root: str = root
+        self.manifest_path: str = manifest_path
+        self.first_codepoint: int = first_codepoint
+        self.size: str = size
+        self.entries: Dict[str, Entry] = {}
+        self.loaded: Set[str] = set()
+
+        if not self.read_manifest():
+            self.rescan()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.entries
+
+    def read_manifest(self) -> bool:
+        """
+        :return: False if there is no usable manifest for this root and first codepoint
+        :rtype: bool
+        """
+        if not os.path.exists(self.manifest_path):
+            return False
+        with open(self.manifest_path) as f:
+            manifest = json.load(f)
+        if (
+            manifest.get("version") != MANIFEST_VERSION
+            or manifest.get("root") != self.root
+            or manifest.get("first_codepoint") != self.first_codepoint
+        ):
+            return False
+
+        self.entries = {name: tuple(entry) for name, *entry in manifest["tiles"]}
+        try:
+            self.check_codepoints()
+        except ValueError:
+            self.entries = {}
+            return False
+        return True
+
+    def write_manifest(self):
+        directory = os.path.dirname(self.manifest_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        manifest = dict(
+            version=MANIFEST_VERSION,
+            root=self.root,
+            first_codepoint=self.first_codepoint,
+            tiles=[[name, *entry] for name, entry in self.entries.items()],
+        )
+        with open(self.manifest_path, "w") as f:
+            json.dump(manifest, f)
+
+    def rescan(self) -> int:
+        """
+        walks the tiles directory and appends sprites not in the manifest yet, after the highest codepoint in use
+        :return: number of sprites added
+        :rtype: int
+        """
+        codepoint = max((entry[1] for entry in self.entries.values()), default=self.first_codepoint - 1)
+        added = 0
+        for name in scan_tiles(self.root):
+            if name not in self.entries:
+                codepoint += 1
+                path = f"{self.root}/{name}.png"
+                self.entries[name] = (path, codepoint, *image_size(path))
+                added += 1
+        self.check_codepoints()
+
+        if added or not os.path.exists(self.manifest_path):
+            self.write_manifest()
+        return added
+
+    def check_codepoints(self):
+        """
+        raises ValueError if two sprites share a codepoint or one is below first_codepoint, where config.ini's are
+        """
+        owners: Dict[int, str] = {}
+        for name, (_, codepoint, _, _) in self.entries.items():
+            if codepoint < self.first_codepoint:
+                raise ValueError(f"{name} has codepoint 0x{codepoint:X}, below 0x{self.first_codepoint:X}")
+            if codepoint in owners:
+                raise ValueError(f"{name} and {owners[codepoint]} share codepoint 0x{codepoint:X}")
+            owners[codepoint] = name
+
+    def codepoint(self, name: str) -> int:
+        """
+        :param name: sprite name, its path under the tiles directory without the extension
+        :type name: str
+        :return: codepoint the sprite is drawn with, registering it with the terminal on first use
+        :rtype: int
+        """
+        if name not in self.loaded:
+            self.preload((name,))
+        return self.entries[name][1]
+
+    def char(self, name: str) -> str:
+        """
+        :return: the sprite's codepoint as a string, like the Tiles constants
+        :rtype: str
+        """
+        return chr(self.codepoint(name))
+
+    def preload(self, names: Iterable[str]):
+        """
+        registers every sprite in names that isn't loaded yet with a single terminal.set call, e.g. all the
+        sprites a level uses before it is first drawn
+        """
+        missing = [name for name in dict.fromkeys(names) if name not in self.loaded]
+        if not missing:
+            return
+        if any(name not in self.entries for name in missing):
+            self.rescan()
+        unknown = [name for name in missing if name not in self.entries]
+        if unknown:
+            raise KeyError(f"no sprites named {', '.join(unknown)} under {self.root}")
+
+        options = []
+        for name in missing:
+            path, codepoint, width, height = self.entries[name]
+            if f"{width}x{height}" == self.size:
+                options.append(f'0x{codepoint:X}: "{path}", size={self.size}')
+            else:
+                # given a size, the terminal would cut the image into a tileset spanning several codepoints
+                options.append(f'0x{codepoint:X}: "{path}"')
+        terminal.set("; ".join(options))
+        self.loaded.update(missing)
+
+
+def main() -> int:
+    registry = TileRegistry()
+    added = registry.rescan()
+    print(f"{len(registry)} sprites in {registry.manifest_path}, {added} added")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())